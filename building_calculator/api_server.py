@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP API for Building Calculator
+
+Optional asyncio HTTP/JSON service exposing ``calculator.calculate`` to
+other tools. The request parameters use the same keys as the dict built by
+``calculator.params_from_settings``; keys that are left out fall back to
+the plugin settings the server was started with.
+
+The server only listens on 127.0.0.1. Connections are kept alive (HTTP/1.1)
+and pipelined requests are answered in order, and one POST can carry a
+whole batch of buildings, so scripts do not pay a connection or request
+per building.
+
+Endpoints:
+
+* ``GET /health`` -- ``{"status": "ok"}``
+* ``GET /params`` -- the parameters used when a request does not set them
+* ``POST /calculate`` -- ``{"area": 500, "floors": 9, "params": {...}}``
+  returns one result; ``{"buildings": [{"area": ..., "floors": ...}, ...],
+  "params": {...}}`` returns ``{"results": [...]}``
+"""
+
+import asyncio
+import json
+import math
+import threading
+from http import HTTPStatus
+
+from . import calculator
+
+
+HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+KEEP_ALIVE_TIMEOUT = 15.0
+MAX_BODY_SIZE = 16 * 1024 * 1024
+MAX_HEADERS = 100
+MAX_BATCH_SIZE = 100000
+MAX_FLOORS = 200
+
+# (minimum, maximum) of numeric parameters; the ones shown in SettingsDialog
+# use the ranges of its spin boxes, divisors must be positive
+PARAM_RANGES = {
+    'avg_apt_size': (10.0, 300.0),
+    'residents_per_apt': (0.5, 10.0),
+    'sqm_per_resident': (1.0, math.inf),
+    'parking_spot_size': (10.0, 50.0),
+    'parking_per_apt': (0.0, 5.0),
+    'parkings_for_residents': (0.0, math.inf),
+    'per_residents': (0.0, math.inf),
+    'parkings_for_sqm': (0.0, math.inf),
+    'per_sqm': (0.0, math.inf),
+}
+
+# Allowed values of choice parameters
+PARAM_CHOICES = {
+    'residents_mode': ('per_apt', 'per_sqm'),
+    'parking_mode': ('per_apt', 'per_residents', 'per_sqm'),
+}
+
+# (minimum, maximum) of the numeric fields of an apartment type
+APT_TYPE_RANGES = {
+    'size': (1.0, math.inf),
+    'count': (0.0, math.inf),
+    'residents': (0.0, math.inf),
+    'parking': (0.0, math.inf),
+}
+
+
+class ApiError(Exception):
+    """Error answered with an HTTP status and a JSON message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def is_number(value, minimum=-math.inf, maximum=math.inf):
+    """Finite JSON number (not a bool) within the range."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and \
+        math.isfinite(value) and minimum <= value <= maximum
+
+
+def valid_apt_types(value):
+    """Check a list of apartment types as stored by SettingsDialog."""
+    if not isinstance(value, list):
+        return False
+    for apt in value:
+        if not isinstance(apt, dict) or not isinstance(apt.get('name', ''), str):
+            return False
+        for key, (minimum, maximum) in APT_TYPE_RANGES.items():
+            if key in apt and not is_number(apt[key], minimum, maximum):
+                return False
+    return True
+
+
+def merge_params(base, overrides):
+    """Apply request parameters over the server parameters.
+
+    :param overrides: Dict with a subset of the keys of ``base``.
+    :raises ApiError: On unknown keys or values of the wrong type.
+    """
+    if overrides is None:
+        return base
+    if not isinstance(overrides, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, '"params" must be an object')
+
+    params = dict(base)
+    for key, value in overrides.items():
+        if key not in base:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f'Unknown parameter: {key}')
+        default = base[key]
+        if key in PARAM_RANGES:
+            valid = is_number(value, *PARAM_RANGES[key])
+        elif key in PARAM_CHOICES:
+            valid = value in PARAM_CHOICES[key]
+        elif key == 'apt_types':
+            valid = valid_apt_types(value)
+        else:
+            valid = isinstance(value, type(default))
+        if not valid:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f'Invalid value for parameter: {key}')
+        params[key] = value
+    return params
+
+
+def calculate_building(building, params):
+    """Calculate one building of a request."""
+    if not isinstance(building, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Building must be an object')
+    for key in ('area', 'floors'):
+        if key not in building:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f'Missing field: {key}')
+    if not is_number(building['area'], 0.0):
+        raise ApiError(HTTPStatus.BAD_REQUEST, '"area" must be a finite number >= 0')
+    floors = building['floors']
+    if not is_number(floors, 1, MAX_FLOORS) or floors != int(floors):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f'"floors" must be an integer from 1 to {MAX_FLOORS}')
+    return calculator.calculate(float(building['area']), int(building['floors']), params)
+
+
+def calculate_request(payload, base_params):
+    """Calculate a single or batched request body."""
+    if not isinstance(payload, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Request body must be a JSON object')
+    params = merge_params(base_params, payload.get('params'))
+
+    if 'buildings' not in payload:
+        return calculate_building(payload, params)
+
+    buildings = payload['buildings']
+    if not isinstance(buildings, list):
+        raise ApiError(HTTPStatus.BAD_REQUEST, '"buildings" must be a list')
+    if len(buildings) > MAX_BATCH_SIZE:
+        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f'At most {MAX_BATCH_SIZE} buildings per request')
+    return {'results': [calculate_building(building, params) for building in buildings]}
+
+
+class CalculatorServer:
+    """HTTP/JSON calculation service running in a background thread."""
+
+    def __init__(self, params, port=DEFAULT_PORT, host=HOST):
+        """Constructor.
+
+        :param params: Default calculation parameters, see
+            calculator.params_from_settings.
+        :param port: TCP port; 0 picks a free one (see ``port`` after start).
+        """
+        self.params = params
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.thread = None
+        self.server = None
+        self.error = None
+        self.connections = {}
+
+    @property
+    def url(self):
+        """Base URL of the running server."""
+        return f'http://{self.host}:{self.port}'
+
+    def is_running(self):
+        """Whether the server thread is alive."""
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Start listening; returns once the socket is bound.
+
+        :raises OSError: If the port cannot be bound.
+        """
+        ready = threading.Event()
+        self.error = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.serve, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait()
+        if self.error is not None:
+            self.thread.join()
+            raise self.error
+
+    def stop(self):
+        """Close the server and wait for the thread to finish."""
+        if not self.is_running():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def serve(self, ready):
+        """Thread body: run the event loop until ``stop``."""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_connection, self.host, self.port)
+            )
+        except OSError as e:
+            self.error = e
+            self.loop.close()
+            ready.set()
+            return
+
+        self.port = self.server.sockets[0].getsockname()[1]
+        ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            # Since Python 3.12 wait_closed() also waits for open connections,
+            # so keep-alive connections are closed first; their handlers
+            # then read EOF and finish
+            tasks = list(self.connections)
+            for writer in self.connections.values():
+                writer.close()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+    async def read_request(self, reader):
+        """Read one request; returns None when the client closed the connection.
+
+        :returns: Tuple (method, path, version, headers dict, body bytes).
+        """
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:
+            # readline() raises ValueError for lines over the stream limit
+            raise ApiError(HTTPStatus.BAD_REQUEST, 'Request line too long')
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, 'Malformed request line')
+
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'Header line too long')
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'Too many headers')
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, 'Invalid Content-Length')
+        if length < 0:
+            raise ApiError(HTTPStatus.BAD_REQUEST, 'Invalid Content-Length')
+        if length > MAX_BODY_SIZE:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'Request body too large')
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target.split('?', 1)[0], version, headers, body
+
+    def dispatch(self, method, path, body):
+        """Answer a request; returns (status, JSON-serializable payload)."""
+        if path == '/health':
+            if method != 'GET':
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, 'Use GET')
+            return HTTPStatus.OK, {'status': 'ok'}
+        if path == '/params':
+            if method != 'GET':
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, 'Use GET')
+            return HTTPStatus.OK, self.params
+        if path == '/calculate':
+            if method != 'POST':
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, 'Use POST')
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, 'Request body is not valid JSON')
+            return HTTPStatus.OK, calculate_request(payload, self.params)
+        raise ApiError(HTTPStatus.NOT_FOUND, f'Unknown path: {path}')
+
+    @staticmethod
+    def response(status, payload, keep_alive):
+        """Encode an HTTP response.
+
+        :raises ValueError: If the payload contains NaN or infinity, which
+            JSON cannot represent.
+        """
+        body = json.dumps(payload, ensure_ascii=False, allow_nan=False).encode('utf-8')
+        head = (
+            f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            f'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+            f'\r\n'
+        )
+        return head.encode('latin-1') + body
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests of one connection until it is closed."""
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except ApiError as e:
+                    # The rest of a malformed request cannot be skipped reliably
+                    writer.write(self.response(e.status, {'error': e.message}, False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                method, path, version, headers, body = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                try:
+                    status, payload = self.dispatch(method, path, body)
+                except ApiError as e:
+                    status, payload = e.status, {'error': e.message}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f'{type(e).__name__}: {e}'}
+                try:
+                    data = self.response(status, payload, keep_alive)
+                except ValueError:
+                    # e.g. huge apartment type counts overflow the totals
+                    data = self.response(
+                        HTTPStatus.BAD_REQUEST, {'error': 'Result is not a finite number'}, keep_alive
+                    )
+                writer.write(data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self.connections.pop(task, None)
+            writer.close()
@@ -8,12 +8,24 @@ import importlib
 import sys
 from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication, Qt
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtWidgets import QAction, QMessageBox
+from qgis.PyQt.QtWidgets import QAction, QMessageBox, QInputDialog
 from qgis.core import QgsProject, QgsWkbTypes
 from qgis.utils import reloadPlugin
 
+from . import calculator
 from .settings_dialog import SettingsDialog
 from .calculation_dialog import CalculationDialog
+from .layer_dialog import LayerCalculationDialog
+from .goal_seek_dialog import GoalSeekDialog
+from .density_dialog import DensityRasterDialog
+from .rules_dialog import RulesDialog
+from .preview_tool import PreviewMapTool
+from .phasing_dialog import PhasingDialog
+from .report_dialog import ReportDialog
+from .catchment_dialog import CatchmentDialog
+from .api_server import CalculatorServer, DEFAULT_PORT
+from .layer_processor import create_distance_area, measure_area
+from .parking_layout import ParkingLayoutGenerator, create_layout_layers
 
 
 class BuildingCalculator:
@@ -36,6 +48,7 @@ class BuildingCalculator:
         
         # Settings
         self.settings = QSettings()
+        self.api_server = None
         
     def tr(self, message):
         """Get the translation for a string using Qt translation API."""
@@ -87,6 +100,109 @@ class BuildingCalculator:
             status_tip=self.tr('Calculate residents and parking for selected building')
         )
         
+        # Preview tool action - live calculation while drawing a footprint
+        self.preview_tool = PreviewMapTool(self.iface.mapCanvas(), self.settings)
+        preview_action = self.add_action(
+            icon_path,
+            text=self.tr('Draw Building with Preview'),
+            callback=self.run_preview_tool,
+            parent=self.iface.mainWindow(),
+            status_tip=self.tr('Draw a footprint and see residents and parking while drawing')
+        )
+        preview_action.setCheckable(True)
+        self.preview_tool.setAction(preview_action)
+        
+        # Layer action - calculate all buildings of the active layer
+        self.add_action(
+            icon_path,
+            text=self.tr('Calculate Layer'),
+            callback=self.run_layer_calculation,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Calculate residents and parking for all buildings of the layer')
+        )
+        
+        # Goal seek action - floors or footprint needed to reach a target
+        self.add_action(
+            icon_path,
+            text=self.tr('Goal Seek'),
+            callback=self.run_goal_seek,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Solve floors or footprint area needed to reach a target')
+        )
+        
+        # Norms action - JSON rules evaluated over the layer
+        self.add_action(
+            icon_path,
+            text=self.tr('Norms'),
+            callback=self.run_rules,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Evaluate normative rules for all buildings of the layer')
+        )
+        
+        # Phasing action - cumulative totals over build years
+        self.add_action(
+            icon_path,
+            text=self.tr('Construction Phasing'),
+            callback=self.run_phasing,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Cumulative residents and parking by build year or phase')
+        )
+        
+        # Report action - per-building HTML / PDF report
+        self.add_action(
+            icon_path,
+            text=self.tr('Building Report'),
+            callback=self.run_report,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Export an HTML or PDF report for all buildings of the layer')
+        )
+        
+        # Catchment action - residents per nearest facility
+        self.add_action(
+            icon_path,
+            text=self.tr('Catchment Analysis'),
+            callback=self.run_catchment,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Assign residents to the nearest stop, school or clinic')
+        )
+        
+        # Density raster action - residents and parking per grid cell
+        self.add_action(
+            icon_path,
+            text=self.tr('Density Raster'),
+            callback=self.run_density_raster,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Rasterize residents and parking demand of the layer')
+        )
+        
+        # Parking layout action - place stalls inside the selected lot
+        self.add_action(
+            icon_path,
+            text=self.tr('Parking Layout'),
+            callback=self.run_parking_layout,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Lay out parking stalls inside the selected lot polygon')
+        )
+        
+        # API server action - local HTTP/JSON calculation service
+        self.api_action = self.add_action(
+            icon_path,
+            text=self.tr('Local API Server'),
+            callback=self.run_api_server,
+            parent=self.iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=self.tr('Serve calculations over HTTP/JSON on 127.0.0.1')
+        )
+        self.api_action.setCheckable(True)
+        
         # Settings action
         self.add_action(
             icon_path,
@@ -109,13 +225,17 @@ class BuildingCalculator:
 
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
+        if self.iface.mapCanvas().mapTool() is self.preview_tool:
+            self.iface.mapCanvas().unsetMapTool(self.preview_tool)
+        if self.api_server is not None:
+            self.api_server.stop()
         for action in self.actions:
             self.iface.removePluginMenu(self.menu, action)
             self.iface.removeToolBarIcon(action)
         del self.toolbar
 
-    def get_selected_polygon(self):
-        """Get the currently selected polygon feature."""
+    def get_polygon_layer(self):
+        """Get the active layer if it is a polygon layer."""
         layer = self.iface.activeLayer()
         
         if layer is None:
@@ -133,6 +253,14 @@ class BuildingCalculator:
                 self.tr('Please select a polygon layer.')
             )
             return None
+        
+        return layer
+
+    def get_selected_polygon(self):
+        """Get the currently selected polygon feature."""
+        layer = self.get_polygon_layer()
+        if layer is None:
+            return None
             
         selected_features = layer.selectedFeatures()
         
@@ -160,29 +288,163 @@ class BuildingCalculator:
         if feature is None:
             return
             
-        geometry = feature.geometry()
-        area = geometry.area()
-        
-        # Get CRS to check if we need to convert area
+        # If CRS is geographic (degrees), area is calculated on the ellipsoid
         layer = self.iface.activeLayer()
-        crs = layer.crs()
-        
-        # If CRS is geographic (degrees), we need to calculate area differently
-        if crs.isGeographic():
-            # Use ellipsoidal calculation
-            from qgis.core import QgsDistanceArea
-            da = QgsDistanceArea()
-            da.setSourceCrs(crs, QgsProject.instance().transformContext())
-            da.setEllipsoid(QgsProject.instance().ellipsoid())
-            area = da.measureArea(geometry)
+        area = measure_area(feature.geometry(), create_distance_area(layer.crs()))
         
         dialog = CalculationDialog(self.iface.mainWindow(), area, self.settings)
         dialog.exec_()
 
+    def run_preview_tool(self):
+        """Activate the live preview map tool."""
+        self.iface.mapCanvas().setMapTool(self.preview_tool)
+
+    def run_layer_calculation(self):
+        """Run the calculation for all buildings of the active layer."""
+        layer = self.get_polygon_layer()
+        if layer is None:
+            return
+        
+        dialog = LayerCalculationDialog(self.iface.mainWindow(), layer, self.settings)
+        dialog.exec_()
+
+    def run_goal_seek(self):
+        """Run the goal seek for all buildings of the active layer."""
+        layer = self.get_polygon_layer()
+        if layer is None:
+            return
+        
+        dialog = GoalSeekDialog(self.iface.mainWindow(), layer, self.settings)
+        dialog.exec_()
+
+    def run_rules(self):
+        """Evaluate normative rules for all buildings of the active layer."""
+        layer = self.get_polygon_layer()
+        if layer is None:
+            return
+        
+        dialog = RulesDialog(self.iface.mainWindow(), layer, self.settings)
+        dialog.exec_()
+
+    def run_phasing(self):
+        """Show cumulative totals by phase for the active layer."""
+        layer = self.get_polygon_layer()
+        if layer is None:
+            return
+        
+        dialog = PhasingDialog(self.iface.mainWindow(), layer, self.settings)
+        dialog.exec_()
+
+    def run_report(self):
+        """Export a per-building report for the active layer."""
+        layer = self.get_polygon_layer()
+        if layer is None:
+            return
+        
+        dialog = ReportDialog(self.iface.mainWindow(), layer, self.settings)
+        dialog.exec_()
+
+    def run_catchment(self):
+        """Assign residents of the active layer to the nearest facilities."""
+        layer = self.get_polygon_layer()
+        if layer is None:
+            return
+        
+        dialog = CatchmentDialog(self.iface.mainWindow(), layer, self.settings)
+        dialog.exec_()
+
+    def run_density_raster(self):
+        """Create a density raster for all buildings of the active layer."""
+        layer = self.get_polygon_layer()
+        if layer is None:
+            return
+        
+        dialog = DensityRasterDialog(self.iface.mainWindow(), layer, self.settings)
+        dialog.exec_()
+
+    def run_parking_layout(self):
+        """Lay out parking stalls inside the selected lot polygon."""
+        feature = self.get_selected_polygon()
+        if feature is None:
+            return
+        
+        layer = self.iface.activeLayer()
+        if layer.crs().isGeographic():
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                self.tr('Wrong CRS'),
+                self.tr('Parking layout requires a projected CRS in meters.')
+            )
+            return
+        
+        required, ok = QInputDialog.getInt(
+            self.iface.mainWindow(),
+            self.tr('Parking Layout'),
+            self.tr('Required number of stalls:'),
+            100, 0, 100000
+        )
+        if not ok:
+            return
+        
+        result = ParkingLayoutGenerator().layout(feature.geometry(), required)
+        QgsProject.instance().addMapLayers(create_layout_layers(result, layer.crs()))
+        
+        if result['fits']:
+            QMessageBox.information(
+                self.iface.mainWindow(),
+                self.tr('Parking Layout'),
+                self.tr('Placed {0} stalls, required {1}.').format(result['capacity'], required)
+            )
+        else:
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                self.tr('Parking Layout'),
+                self.tr('Only {0} stalls fit, required {1}.').format(result['capacity'], required)
+            )
+
     def run_settings(self):
         """Run the settings dialog."""
         dialog = SettingsDialog(self.iface.mainWindow(), self.settings)
         dialog.exec_()
+        if self.api_server is not None:
+            self.api_server.params = calculator.params_from_settings(self.settings)
+    
+    def run_api_server(self, checked):
+        """Start or stop the local HTTP API."""
+        if not checked:
+            if self.api_server is not None:
+                self.api_server.stop()
+                self.api_server = None
+            return
+        
+        port, ok = QInputDialog.getInt(
+            self.iface.mainWindow(),
+            self.tr('Local API Server'),
+            self.tr('Port on 127.0.0.1:'),
+            int(self.settings.value(SettingsDialog.KEY_API_PORT, DEFAULT_PORT)), 1024, 65535
+        )
+        if not ok:
+            self.api_action.setChecked(False)
+            return
+        
+        server = CalculatorServer(calculator.params_from_settings(self.settings), port)
+        try:
+            server.start()
+        except OSError as e:
+            self.api_action.setChecked(False)
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                self.tr('Local API Server'),
+                self.tr('Could not start the server: {0}').format(e)
+            )
+            return
+        
+        self.settings.setValue(SettingsDialog.KEY_API_PORT, port)
+        self.api_server = server
+        self.iface.messageBar().pushInfo(
+            self.tr('Local API Server'),
+            self.tr('Listening on {0}').format(server.url)
+        )
     
     def reload_plugin(self):
         """Reload the plugin without restarting QGIS."""
@@ -4,7 +4,6 @@ Calculation Dialog for Building Calculator
 """
 
 import json
-import math
 from qgis.PyQt.QtCore import Qt
 from qgis.PyQt.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
@@ -13,6 +12,7 @@ from qgis.PyQt.QtWidgets import (
 )
 
 from .settings_dialog import SettingsDialog
+from . import calculator
 
 
 class CalculationDialog(QDialog):
@@ -113,7 +113,7 @@ class CalculationDialog(QDialog):
         self.sqm_per_resident_label = QLabel('М² на 1 жителя:')
         self.spin_sqm_per_resident = QDoubleSpinBox()
         self.spin_sqm_per_resident.setRange(5.0, 100.0)
-        self.spin_sqm_per_resident.setValue(20.0)
+        self.spin_sqm_per_resident.setValue(SettingsDialog.DEFAULT_SQM_PER_RESIDENT)
         self.spin_sqm_per_resident.setSuffix(' м²')
         self.spin_sqm_per_resident.setDecimals(1)
         self.spin_sqm_per_resident.valueChanged.connect(self.calculate)
@@ -196,7 +196,7 @@ class CalculationDialog(QDialog):
         self.parkings_residents_label = QLabel('Парковок:')
         self.spin_parkings_for_residents = QDoubleSpinBox()
         self.spin_parkings_for_residents.setRange(1.0, 10000.0)
-        self.spin_parkings_for_residents.setValue(350.0)  # 350 parkings per 1000 residents
+        self.spin_parkings_for_residents.setValue(SettingsDialog.DEFAULT_PARKINGS_FOR_RESIDENTS)
         self.spin_parkings_for_residents.setDecimals(0)
         self.spin_parkings_for_residents.valueChanged.connect(self.calculate)
         parking_layout.addRow(self.parkings_residents_label, self.spin_parkings_for_residents)
@@ -204,7 +204,7 @@ class CalculationDialog(QDialog):
         self.per_residents_label = QLabel('На жителей:')
         self.spin_per_residents = QDoubleSpinBox()
         self.spin_per_residents.setRange(1.0, 100000.0)
-        self.spin_per_residents.setValue(1000.0)  # 350 parkings per 1000 residents
+        self.spin_per_residents.setValue(SettingsDialog.DEFAULT_PER_RESIDENTS)
         self.spin_per_residents.setDecimals(0)
         self.spin_per_residents.valueChanged.connect(self.calculate)
         parking_layout.addRow(self.per_residents_label, self.spin_per_residents)
@@ -213,7 +213,7 @@ class CalculationDialog(QDialog):
         self.parkings_sqm_label = QLabel('Парковок:')
         self.spin_parkings_for_sqm = QDoubleSpinBox()
         self.spin_parkings_for_sqm.setRange(1.0, 10000.0)
-        self.spin_parkings_for_sqm.setValue(1.0)
+        self.spin_parkings_for_sqm.setValue(SettingsDialog.DEFAULT_PARKINGS_FOR_SQM)
         self.spin_parkings_for_sqm.setDecimals(0)
         self.spin_parkings_for_sqm.valueChanged.connect(self.calculate)
         parking_layout.addRow(self.parkings_sqm_label, self.spin_parkings_for_sqm)
@@ -221,7 +221,7 @@ class CalculationDialog(QDialog):
         self.per_sqm_label = QLabel('На м² квартиры:')
         self.spin_per_sqm = QDoubleSpinBox()
         self.spin_per_sqm.setRange(1.0, 100000.0)
-        self.spin_per_sqm.setValue(50.0)  # 1 parking per 50 sqm
+        self.spin_per_sqm.setValue(SettingsDialog.DEFAULT_PER_SQM)
         self.spin_per_sqm.setDecimals(0)
         self.spin_per_sqm.valueChanged.connect(self.calculate)
         parking_layout.addRow(self.per_sqm_label, self.spin_per_sqm)
@@ -382,6 +382,24 @@ class CalculationDialog(QDialog):
         # Update parking mode visibility
         self.on_parking_mode_changed(0)
     
+    def get_params(self):
+        """Collect calculation parameters from the dialog widgets."""
+        return {
+            'use_types': self.check_use_types.isChecked(),
+            'apt_types': self.get_apartment_types_from_table(),
+            'avg_apt_size': self.spin_apt_size.value(),
+            'residents_mode': self.combo_residents_mode.currentData(),
+            'residents_per_apt': self.spin_residents.value(),
+            'sqm_per_resident': self.spin_sqm_per_resident.value(),
+            'parking_spot_size': self.spin_parking_size.value(),
+            'parking_mode': self.combo_parking_mode.currentData(),
+            'parking_per_apt': self.spin_parking_per_apt.value(),
+            'parkings_for_residents': self.spin_parkings_for_residents.value(),
+            'per_residents': self.spin_per_residents.value(),
+            'parkings_for_sqm': self.spin_parkings_for_sqm.value(),
+            'per_sqm': self.spin_per_sqm.value(),
+        }
+    
     def calculate(self):
         """Perform the calculation and update results."""
         floors = self.spin_floors.value()
@@ -399,21 +417,15 @@ class CalculationDialog(QDialog):
     
     def calculate_with_types(self, total_area, apt_types, parking_spot_size):
         """Calculate using apartment types."""
-        total_apartments = 0
-        total_residents = 0
-        used_area = 0
-        
-        for apt in apt_types:
-            apt_count = apt.get("count", 1)
-            apt_size = apt.get("size", 50)
-            apt_residents = apt_count * apt.get("residents", 2.0)
-            
-            total_apartments += apt_count
-            total_residents += apt_residents
-            used_area += apt_count * apt_size
+        params = self.get_params()
+        params['apt_types'] = apt_types
+        params['parking_spot_size'] = parking_spot_size
+        result = calculator.calculate_with_types(total_area, params)
+        total_apartments = result['apartments']
+        used_area = result['used_area']
         
         # Check if apartments exceed building area
-        if used_area > total_area:
+        if result['exceeded']:
             self.label_apartments.setText(f'{total_apartments:,} ⚠️')
             self.label_apartments.setStyleSheet('font-weight: bold; color: #d32f2f;')
             self.label_residents.setText(f'Превышение площади! ({int(used_area):,} > {int(total_area):,} м²)')
@@ -426,61 +438,21 @@ class CalculationDialog(QDialog):
         else:
             self.label_apartments.setStyleSheet('font-weight: bold;')
             self.label_residents.setStyleSheet('font-weight: bold; font-size: 16px; color: #2e7d32;')
-            unused = total_area - used_area
+            unused = result['unused_area']
             self.label_unused_area.setText(f'Использовано: {int(used_area):,} м² | Свободно: {int(unused):,} м²')
             self.label_unused_area.setStyleSheet('font-style: italic; color: #888;')
         
-        # Apply parking mode
-        total_parking = self.calculate_parking(total_apartments, total_residents, total_area)
-        total_parking = math.floor(total_parking)  # Round down before calculating area
-        parking_area = total_parking * parking_spot_size
-        
-        self.label_apartments.setText(f'{total_apartments:,}')
-        self.label_residents.setText(f'{int(total_residents):,} человек')
-        self.label_parking.setText(f'{total_parking:,} мест')
-        self.label_parking_area.setText(f'{int(parking_area):,} м²')
+        self.show_result(result)
     
     def calculate_simple(self, total_area, parking_spot_size):
         """Calculate using simple mode."""
-        avg_apt_size = self.spin_apt_size.value()
-        apartments = math.floor(total_area / avg_apt_size)
-        
-        # Calculate residents based on mode
-        residents_mode = self.combo_residents_mode.currentData()
-        if residents_mode == 'per_apt':
-            residents = apartments * self.spin_residents.value()
-        else:  # per_sqm - residents per sqm of apartment
-            residents_per_apt = avg_apt_size / self.spin_sqm_per_resident.value()
-            residents = apartments * residents_per_apt
-        
-        # Calculate parking
-        parking = self.calculate_parking(apartments, residents, total_area)
-        parking = math.floor(parking)  # Round down before calculating area
-        parking_area = parking * parking_spot_size
-        
-        self.label_apartments.setText(f'{apartments:,}')
-        self.label_residents.setText(f'{int(residents):,} человек')
-        self.label_parking.setText(f'{parking:,} мест')
-        self.label_parking_area.setText(f'{int(parking_area):,} м²')
+        params = self.get_params()
+        params['parking_spot_size'] = parking_spot_size
+        self.show_result(calculator.calculate_simple(total_area, params))
     
-    def calculate_parking(self, apartments, residents, total_area):
-        """Calculate parking based on selected mode."""
-        parking_mode = self.combo_parking_mode.currentData()
-        
-        if parking_mode == 'per_apt':
-            # Парковок на 1 квартиру
-            return apartments * self.spin_parking_per_apt.value()
-        elif parking_mode == 'per_residents':
-            # X парковок на Y жителей
-            parkings = self.spin_parkings_for_residents.value()
-            per_residents = self.spin_per_residents.value()
-            if per_residents > 0:
-                return (residents / per_residents) * parkings
-            return 0
-        else:  # per_sqm
-            # X парковок на Y м²
-            parkings = self.spin_parkings_for_sqm.value()
-            per_sqm = self.spin_per_sqm.value()
-            if per_sqm > 0:
-                return (total_area / per_sqm) * parkings
-            return 0
+    def show_result(self, result):
+        """Show calculation totals in the result labels."""
+        self.label_apartments.setText(f'{result["apartments"]:,}')
+        self.label_residents.setText(f'{int(result["residents"]):,} человек')
+        self.label_parking.setText(f'{result["parking"]:,} мест')
+        self.label_parking_area.setText(f'{int(result["parking_area"]):,} м²')
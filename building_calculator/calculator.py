@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Calculation model for Building Calculator
+
+Pure functions shared by the dialogs and the layer-wide runs. They take a
+plain ``params`` dict (see ``params_from_settings``) so they can be used
+without any widgets. Qt is only imported by the settings helpers, so worker
+processes can import this module without QGIS.
+
+``calculate_arrays`` is the same model on numpy arrays, used by the
+layer-wide analyses (goal seek, density raster, norms, phasing, catchment).
+"""
+
+import json
+import math
+import numpy as np
+
+
+def _to_bool(value):
+    """Convert a QSettings value to bool."""
+    if isinstance(value, str):
+        return value.lower() == 'true'
+    return bool(value)
+
+
+def load_apartment_types(settings):
+    """Load apartment types from QSettings, falling back to defaults."""
+    from .settings_dialog import SettingsDialog
+    types_json = settings.value(SettingsDialog.KEY_APARTMENT_TYPES, None)
+    if types_json:
+        try:
+            return json.loads(types_json)
+        except:
+            return SettingsDialog.DEFAULT_APARTMENT_TYPES
+    return SettingsDialog.DEFAULT_APARTMENT_TYPES
+
+
+def params_from_settings(settings):
+    """Build a calculation parameters dict from QSettings."""
+    from .settings_dialog import SettingsDialog
+    return {
+        'use_types': _to_bool(settings.value(
+            SettingsDialog.KEY_USE_APT_TYPES, SettingsDialog.DEFAULT_USE_APT_TYPES
+        )),
+        'apt_types': load_apartment_types(settings),
+        'avg_apt_size': float(settings.value(
+            SettingsDialog.KEY_AVG_APT_SIZE, SettingsDialog.DEFAULT_AVG_APT_SIZE
+        )),
+        'residents_mode': SettingsDialog.DEFAULT_RESIDENTS_MODE,
+        'residents_per_apt': float(settings.value(
+            SettingsDialog.KEY_RESIDENTS_PER_APT, SettingsDialog.DEFAULT_RESIDENTS_PER_APT
+        )),
+        'sqm_per_resident': SettingsDialog.DEFAULT_SQM_PER_RESIDENT,
+        'parking_spot_size': float(settings.value(
+            SettingsDialog.KEY_PARKING_SPOT_SIZE, SettingsDialog.DEFAULT_PARKING_SPOT_SIZE
+        )),
+        'parking_mode': SettingsDialog.DEFAULT_PARKING_MODE,
+        'parking_per_apt': float(settings.value(
+            SettingsDialog.KEY_PARKING_PER_APT, SettingsDialog.DEFAULT_PARKING_PER_APT
+        )),
+        'parkings_for_residents': SettingsDialog.DEFAULT_PARKINGS_FOR_RESIDENTS,
+        'per_residents': SettingsDialog.DEFAULT_PER_RESIDENTS,
+        'parkings_for_sqm': SettingsDialog.DEFAULT_PARKINGS_FOR_SQM,
+        'per_sqm': SettingsDialog.DEFAULT_PER_SQM,
+    }
+
+
+def calculate_parking(apartments, residents, total_area, params):
+    """Calculate parking based on the parking mode in ``params``."""
+    parking_mode = params['parking_mode']
+
+    if parking_mode == 'per_apt':
+        # Парковок на 1 квартиру
+        return apartments * params['parking_per_apt']
+    elif parking_mode == 'per_residents':
+        # X парковок на Y жителей
+        parkings = params['parkings_for_residents']
+        per_residents = params['per_residents']
+        if per_residents > 0:
+            return (residents / per_residents) * parkings
+        return 0
+    else:  # per_sqm
+        # X парковок на Y м²
+        parkings = params['parkings_for_sqm']
+        per_sqm = params['per_sqm']
+        if per_sqm > 0:
+            return (total_area / per_sqm) * parkings
+        return 0
+
+
+def calculate_with_types(total_area, params):
+    """Calculate using apartment types.
+
+    If the apartments do not fit into ``total_area`` the result has
+    ``exceeded`` set and no parking figures.
+    """
+    total_apartments = 0
+    total_residents = 0
+    used_area = 0
+
+    for apt in params['apt_types']:
+        apt_count = apt.get("count", 1)
+        apt_size = apt.get("size", 50)
+        apt_residents = apt_count * apt.get("residents", 2.0)
+
+        total_apartments += apt_count
+        total_residents += apt_residents
+        used_area += apt_count * apt_size
+
+    result = {
+        'total_area': total_area,
+        'apartments': total_apartments,
+        'residents': total_residents,
+        'used_area': used_area,
+        'unused_area': total_area - used_area,
+        'exceeded': used_area > total_area,
+        'parking': None,
+        'parking_area': None,
+    }
+    if result['exceeded']:
+        return result
+
+    total_parking = calculate_parking(total_apartments, total_residents, total_area, params)
+    total_parking = math.floor(total_parking)  # Round down before calculating area
+    result['parking'] = total_parking
+    result['parking_area'] = total_parking * params['parking_spot_size']
+    return result
+
+
+def calculate_simple(total_area, params):
+    """Calculate using simple mode."""
+    avg_apt_size = params['avg_apt_size']
+    apartments = math.floor(total_area / avg_apt_size)
+
+    # Calculate residents based on mode
+    if params['residents_mode'] == 'per_apt':
+        residents = apartments * params['residents_per_apt']
+    else:  # per_sqm - residents per sqm of apartment
+        residents_per_apt = avg_apt_size / params['sqm_per_resident']
+        residents = apartments * residents_per_apt
+
+    parking = calculate_parking(apartments, residents, total_area, params)
+    parking = math.floor(parking)  # Round down before calculating area
+
+    return {
+        'total_area': total_area,
+        'apartments': apartments,
+        'residents': residents,
+        'exceeded': False,
+        'parking': parking,
+        'parking_area': parking * params['parking_spot_size'],
+    }
+
+
+def calculate(building_area, floors, params):
+    """Calculate apartments, residents and parking for one building."""
+    total_area = building_area * floors
+    if params['use_types']:
+        return calculate_with_types(total_area, params)
+    return calculate_simple(total_area, params)
+
+
+def calculate_share(building_area, floors, params, share):
+    """Calculate the part of a building counted for a share of its footprint.
+
+    Used for footprints partly covered by other buildings (see
+    ``OverlapResolver.footprint_shares``). In simple mode the share of the
+    area is calculated; with apartment types the figures of the whole
+    building are scaled by the share, apartments and parking rounded down.
+    """
+    if not params['use_types']:
+        return calculate(building_area * share, floors, params)
+    result = calculate(building_area, floors, params)
+    result['apartments'] = math.floor(result['apartments'] * share)
+    result['residents'] = result['residents'] * share
+    if result['parking'] is not None:
+        result['parking'] = math.floor(result['parking'] * share)
+        result['parking_area'] = result['parking'] * params['parking_spot_size']
+    return result
+
+
+def used_area(params):
+    """Area taken by the apartment types."""
+    return sum(apt.get("count", 1) * apt.get("size", 50) for apt in params['apt_types'])
+
+
+def types_exceeded(total_area, params):
+    """Boolean array: the apartment types do not fit into the total area."""
+    total_area = np.asarray(total_area, dtype=np.float64)
+    if not params['use_types']:
+        return np.zeros(total_area.shape, dtype=bool)
+    return used_area(params) > total_area
+
+
+def calculate_arrays(total_area, params):
+    """Vectorized ``calculate`` for an array of total areas (area × floors).
+
+    Buildings whose apartment types do not fit into the total area (see
+    ``types_exceeded``) keep the apartments and residents of the types, as
+    ``calculate`` does, and get zero parking where ``calculate`` returns
+    None; totals over a layer are then the same as summing ``calculate``
+    results with missing parking counted as zero.
+
+    :returns: Tuple of float arrays (apartments, residents, parking).
+    """
+    total_area = np.asarray(total_area, dtype=np.float64)
+
+    if params['use_types']:
+        apt_types = params['apt_types']
+        apartments = np.full_like(total_area, sum(apt.get("count", 1) for apt in apt_types))
+        residents = np.full_like(total_area, sum(
+            apt.get("count", 1) * apt.get("residents", 2.0) for apt in apt_types
+        ))
+    else:
+        apartments = np.floor(total_area / params['avg_apt_size'])
+        if params['residents_mode'] == 'per_apt':
+            residents = apartments * params['residents_per_apt']
+        else:  # per_sqm
+            residents = apartments * (params['avg_apt_size'] / params['sqm_per_resident'])
+
+    parking = np.floor(calculate_parking(apartments, residents, total_area, params) + np.zeros_like(total_area))
+    parking = np.where(types_exceeded(total_area, params), 0.0, parking)
+    return apartments, residents, parking
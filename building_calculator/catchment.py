@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Catchment analysis for Building Calculator
+
+Assigns the residents of every building to the nearest facility of a point
+layer (transit stops, schools, clinics) within a distance threshold. The
+nearest facility comes from a QgsSpatialIndex nearest neighbour query on
+the building centroid; loads per facility are summed with
+``numpy.bincount``. Buildings without a facility in range count as
+unserved.
+"""
+
+import numpy as np
+from qgis.core import QgsFeatureRequest, QgsPointXY, QgsSpatialIndex
+
+from .calculator import calculate_arrays
+from .layer_processor import read_layer, write_layer_fields
+
+
+class CatchmentAnalysis:
+    """Nearest facility assignment of building residents."""
+
+    # Output fields of the facility layer
+    FIELD_LOAD = 'bc_load'
+    FIELD_BUILDINGS = 'bc_bldgs'
+    # Output fields of the building layer
+    FIELD_FACILITY = 'bc_fac_id'
+    FIELD_DISTANCE = 'bc_fac_d'
+
+    DEFAULT_MAX_DISTANCE = 500.0
+
+    def __init__(self, buildings, facilities, params, max_distance=DEFAULT_MAX_DISTANCE,
+                 floors_field=None, default_floors=5):
+        """Constructor.
+
+        :param buildings: Polygon layer with buildings.
+        :param facilities: Point layer with facilities in a projected CRS.
+        :param params: Calculation parameters, see calculator.params_from_settings.
+        :param max_distance: Catchment radius in facility layer units.
+        """
+        self.buildings = buildings
+        self.facilities = facilities
+        self.params = params
+        self.max_distance = max_distance
+        self.floors_field = floors_field
+        self.default_floors = default_floors
+
+    def read_facilities(self, feedback=None):
+        """Build the spatial index of the facilities.
+
+        :returns: Tuple (QgsSpatialIndex, facility fids array, dict of fid
+            to position in the array, x array, y array).
+        """
+        request = QgsFeatureRequest()
+        request.setNoAttributes()
+
+        index = QgsSpatialIndex()
+        fids, xs, ys = [], [], []
+        for feature in self.facilities.getFeatures(request):
+            geometry = feature.geometry()
+            if geometry.isEmpty():
+                continue
+            centroid = geometry.centroid()
+            point = centroid.asPoint()
+            feature.setGeometry(centroid)
+            index.addFeature(feature)
+            fids.append(feature.id())
+            xs.append(point.x())
+            ys.append(point.y())
+            if feedback is not None and feedback.isCanceled():
+                break
+
+        positions = {fid: n for n, fid in enumerate(fids)}
+        return index, np.array(fids, dtype=np.int64), positions, np.array(xs), np.array(ys)
+
+    def read_buildings(self, feedback=None):
+        """Read residents and centroids (in facility CRS) of all buildings.
+
+        :returns: Tuple of numpy arrays (fids, x, y, residents).
+        """
+        fids, areas, floors, _, centroids = read_layer(
+            self.buildings, self.floors_field, self.default_floors,
+            feedback=feedback, centroid_crs=self.facilities.crs()
+        )
+        # Empty geometries have no centroid
+        valid = ~np.isnan(centroids[:, 0])
+        fids, areas, floors, centroids = fids[valid], areas[valid], floors[valid], centroids[valid]
+        _, residents, _ = calculate_arrays(areas * floors, self.params)
+        return fids, centroids[:, 0], centroids[:, 1], np.nan_to_num(residents)
+
+    def run(self, feedback=None):
+        """Assign every building to its nearest facility within range.
+
+        :returns: Dict with building arrays ``fids``, ``residents``,
+            ``facility`` (facility fid, -1 if unserved) and ``distance``
+            (NaN if unserved), facility arrays ``facility_fids``, ``loads``
+            and ``counts``, the resident totals ``served`` and
+            ``unserved`` and ``unserved_buildings``; None if cancelled.
+        """
+        index, facility_fids, positions, facility_x, facility_y = self.read_facilities(feedback)
+        fids, xs, ys, residents = self.read_buildings(feedback)
+        if feedback is not None and feedback.isCanceled():
+            return None
+
+        assigned = np.full(len(fids), -1, dtype=np.int64)
+        if len(facility_fids):
+            for n, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+                nearest = index.nearestNeighbor(QgsPointXY(x, y), 1, self.max_distance)
+                if nearest:
+                    assigned[n] = positions[nearest[0]]
+                if feedback is not None and n % 10000 == 0:
+                    if feedback.isCanceled():
+                        return None
+                    # read_layer reports the first half
+                    feedback.setProgress(50.0 + 50.0 * n / max(len(fids), 1))
+
+        served = assigned >= 0
+        distance = np.full(len(fids), np.nan)
+        distance[served] = np.hypot(
+            xs[served] - facility_x[assigned[served]], ys[served] - facility_y[assigned[served]]
+        )
+        facility = np.full(len(fids), -1, dtype=np.int64)
+        facility[served] = facility_fids[assigned[served]]
+        loads = np.bincount(assigned[served], weights=residents[served], minlength=len(facility_fids))
+        counts = np.bincount(assigned[served], minlength=len(facility_fids))
+
+        return {
+            'fids': fids,
+            'residents': residents,
+            'facility': facility,
+            'distance': distance,
+            'facility_fids': facility_fids,
+            'loads': loads,
+            'counts': counts,
+            'served': float(residents[served].sum()),
+            'unserved': float(residents[~served].sum()),
+            'unserved_buildings': int((~served).sum()),
+        }
+
+    def write_results(self, result, write_buildings=True):
+        """Write facility loads and, optionally, building assignments."""
+        write_layer_fields(self.facilities, result['facility_fids'], {
+            self.FIELD_LOAD: result['loads'],
+            self.FIELD_BUILDINGS: result['counts'].astype(np.float64),
+        })
+        if write_buildings:
+            write_layer_fields(self.buildings, result['fids'], {
+                self.FIELD_FACILITY: np.where(result['facility'] >= 0, result['facility'], np.nan),
+                self.FIELD_DISTANCE: result['distance'],
+            })
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Catchment Dialog for Building Calculator
+"""
+
+from qgis.PyQt.QtCore import Qt, QCoreApplication
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
+    QLabel, QSpinBox, QDoubleSpinBox, QPushButton, QGroupBox, QComboBox, QCheckBox,
+    QProgressDialog, QMessageBox
+)
+from qgis.core import QgsFeedback, QgsMapLayerProxyModel
+from qgis.gui import QgsMapLayerComboBox
+
+from . import calculator
+from .catchment import CatchmentAnalysis
+
+
+class CatchmentDialog(QDialog):
+    """Dialog assigning building residents to the nearest facility."""
+
+    def __init__(self, parent=None, layer=None, settings=None):
+        """Constructor.
+
+        :param layer: Polygon layer with buildings.
+        """
+        super().__init__(parent)
+        self.layer = layer
+        self.settings = settings
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Set up the user interface."""
+        self.setWindowTitle('Building Calculator - Зоны обслуживания')
+        self.setMinimumWidth(450)
+
+        layout = QVBoxLayout()
+
+        # Buildings
+        buildings_group = QGroupBox('Здания')
+        buildings_layout = QFormLayout()
+
+        self.combo_floors_field = QComboBox()
+        self.combo_floors_field.addItem('— Не использовать —', None)
+        for field in self.layer.fields():
+            if field.isNumeric():
+                self.combo_floors_field.addItem(field.name(), field.name())
+        buildings_layout.addRow('Поле этажности:', self.combo_floors_field)
+
+        self.spin_floors = QSpinBox()
+        self.spin_floors.setRange(1, 200)
+        self.spin_floors.setValue(5)
+        buildings_layout.addRow('Этажей по умолчанию:', self.spin_floors)
+
+        self.check_write_buildings = QCheckBox(
+            f'Записать объект и расстояние в поля {CatchmentAnalysis.FIELD_FACILITY}, '
+            f'{CatchmentAnalysis.FIELD_DISTANCE}'
+        )
+        self.check_write_buildings.setChecked(True)
+        buildings_layout.addRow(self.check_write_buildings)
+
+        buildings_group.setLayout(buildings_layout)
+        layout.addWidget(buildings_group)
+
+        # Facilities
+        facilities_group = QGroupBox('Объекты обслуживания')
+        facilities_layout = QFormLayout()
+
+        self.combo_facilities = QgsMapLayerComboBox()
+        self.combo_facilities.setFilters(QgsMapLayerProxyModel.PointLayer)
+        facilities_layout.addRow('Точечный слой:', self.combo_facilities)
+
+        self.spin_distance = QDoubleSpinBox()
+        self.spin_distance.setRange(1.0, 100000.0)
+        self.spin_distance.setValue(CatchmentAnalysis.DEFAULT_MAX_DISTANCE)
+        self.spin_distance.setSuffix(' м')
+        self.spin_distance.setDecimals(0)
+        facilities_layout.addRow('Радиус доступности:', self.spin_distance)
+
+        facilities_group.setLayout(facilities_layout)
+        layout.addWidget(facilities_group)
+
+        # Results
+        results_group = QGroupBox('Результат')
+        results_layout = QFormLayout()
+
+        self.label_served = QLabel('-')
+        self.label_served.setStyleSheet('font-weight: bold; font-size: 16px; color: #2e7d32;')
+        results_layout.addRow('👥 Обслужено жителей:', self.label_served)
+
+        self.label_unserved = QLabel('-')
+        self.label_unserved.setStyleSheet('font-weight: bold; font-size: 16px; color: #d32f2f;')
+        results_layout.addRow('Не обслужено жителей:', self.label_unserved)
+
+        self.label_max_load = QLabel('-')
+        results_layout.addRow('Максимальная нагрузка:', self.label_max_load)
+
+        self.label_output = QLabel(
+            f'Нагрузка на объект → поля {CatchmentAnalysis.FIELD_LOAD}, {CatchmentAnalysis.FIELD_BUILDINGS}'
+        )
+        self.label_output.setStyleSheet('font-style: italic; color: #888;')
+        results_layout.addRow(self.label_output)
+
+        results_group.setLayout(results_layout)
+        layout.addWidget(results_group)
+
+        # Buttons
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+
+        self.btn_close = QPushButton('Закрыть')
+        self.btn_close.clicked.connect(self.accept)
+        buttons_layout.addWidget(self.btn_close)
+
+        self.btn_run = QPushButton('Рассчитать')
+        self.btn_run.clicked.connect(self.run)
+        self.btn_run.setDefault(True)
+        buttons_layout.addWidget(self.btn_run)
+
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def run(self):
+        """Assign residents to facilities and write the loads."""
+        facilities = self.combo_facilities.currentLayer()
+        if facilities is None:
+            QMessageBox.warning(self, 'Ошибка', 'Выберите точечный слой объектов обслуживания.')
+            return
+        if facilities.crs().isGeographic():
+            QMessageBox.warning(self, 'Ошибка', 'Для слоя объектов нужна проекция в метрах.')
+            return
+        write_buildings = self.check_write_buildings.isChecked()
+        if facilities.isEditable() or (write_buildings and self.layer.isEditable()):
+            QMessageBox.warning(self, 'Ошибка', 'Завершите редактирование слоёв перед расчётом.')
+            return
+
+        analysis = CatchmentAnalysis(
+            self.layer,
+            facilities,
+            calculator.params_from_settings(self.settings),
+            max_distance=self.spin_distance.value(),
+            floors_field=self.combo_floors_field.currentData(),
+            default_floors=self.spin_floors.value()
+        )
+
+        progress = QProgressDialog('Поиск ближайших объектов...', 'Отмена', 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        feedback = QgsFeedback()
+        progress.canceled.connect(feedback.cancel)
+
+        def on_progress(value):
+            progress.setValue(int(value))
+            QCoreApplication.processEvents()
+
+        feedback.progressChanged.connect(on_progress)
+
+        result = analysis.run(feedback)
+        progress.close()
+        if result is None:
+            return
+        analysis.write_results(result, write_buildings)
+
+        total = result['served'] + result['unserved']
+        share = 100.0 * result['unserved'] / total if total else 0.0
+        self.label_served.setText(f'{int(result["served"]):,} человек')
+        self.label_unserved.setText(
+            f'{int(result["unserved"]):,} человек ({share:.1f}%, зданий: {result["unserved_buildings"]:,})'
+        )
+        if len(result['loads']):
+            self.label_max_load.setText(f'{int(result["loads"].max()):,} человек')
+        else:
+            self.label_max_load.setText('-')
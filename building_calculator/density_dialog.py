@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Density Raster Dialog for Building Calculator
+"""
+
+import uuid
+from qgis.PyQt.QtCore import Qt, QCoreApplication
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
+    QSpinBox, QDoubleSpinBox, QPushButton, QGroupBox, QComboBox, QCheckBox,
+    QProgressDialog, QMessageBox
+)
+from qgis.core import QgsFeedback, QgsProject, QgsRasterLayer
+from qgis.gui import QgsFileWidget
+
+from . import calculator
+from .density_raster import DensityRaster, rasterize_layer
+
+
+class DensityRasterDialog(QDialog):
+    """Dialog for rasterizing residents and parking demand of a layer."""
+
+    def __init__(self, parent=None, layer=None, settings=None):
+        """Constructor.
+
+        :param layer: Polygon layer with buildings.
+        """
+        super().__init__(parent)
+        self.layer = layer
+        self.settings = settings
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Set up the user interface."""
+        self.setWindowTitle('Building Calculator - Растр плотности')
+        self.setMinimumWidth(450)
+
+        layout = QVBoxLayout()
+
+        # Buildings
+        buildings_group = QGroupBox('Здания')
+        buildings_layout = QFormLayout()
+
+        self.combo_floors_field = QComboBox()
+        self.combo_floors_field.addItem('— Не использовать —', None)
+        for field in self.layer.fields():
+            if field.isNumeric():
+                self.combo_floors_field.addItem(field.name(), field.name())
+        buildings_layout.addRow('Поле этажности:', self.combo_floors_field)
+
+        self.spin_floors = QSpinBox()
+        self.spin_floors.setRange(1, 200)
+        self.spin_floors.setValue(5)
+        buildings_layout.addRow('Этажей по умолчанию:', self.spin_floors)
+
+        buildings_group.setLayout(buildings_layout)
+        layout.addWidget(buildings_group)
+
+        # Grid
+        grid_group = QGroupBox('Сетка')
+        grid_layout = QFormLayout()
+
+        self.spin_cell_size = QDoubleSpinBox()
+        self.spin_cell_size.setRange(1.0, 10000.0)
+        self.spin_cell_size.setValue(DensityRaster.DEFAULT_CELL_SIZE)
+        self.spin_cell_size.setSuffix(' м')
+        self.spin_cell_size.setDecimals(1)
+        grid_layout.addRow('Размер ячейки:', self.spin_cell_size)
+
+        self.check_per_hectare = QCheckBox('Плотность на 1 га')
+        self.check_per_hectare.setChecked(True)
+        grid_layout.addRow(self.check_per_hectare)
+
+        self.file_output = QgsFileWidget()
+        self.file_output.setStorageMode(QgsFileWidget.SaveFile)
+        self.file_output.setFilter('GeoTIFF (*.tif)')
+        self.file_output.lineEdit().setPlaceholderText('[Временный слой]')
+        grid_layout.addRow('GeoTIFF:', self.file_output)
+
+        grid_group.setLayout(grid_layout)
+        layout.addWidget(grid_group)
+
+        # Buttons
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+
+        self.btn_close = QPushButton('Закрыть')
+        self.btn_close.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.btn_close)
+
+        self.btn_run = QPushButton('Создать')
+        self.btn_run.clicked.connect(self.run)
+        self.btn_run.setDefault(True)
+        buttons_layout.addWidget(self.btn_run)
+
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def run(self):
+        """Create the density raster and add it to the project."""
+        if self.layer.crs().isGeographic():
+            QMessageBox.warning(self, 'Ошибка', 'Для растра плотности нужна проекция в метрах.')
+            return
+
+        path = self.file_output.filePath()
+        if not path:
+            path = f'/vsimem/building_density_{uuid.uuid4().hex}.tif'
+
+        progress = QProgressDialog('Расчёт плотности...', 'Отмена', 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        feedback = QgsFeedback()
+        progress.canceled.connect(feedback.cancel)
+
+        def on_progress(value):
+            progress.setValue(int(value))
+            QCoreApplication.processEvents()
+
+        feedback.progressChanged.connect(on_progress)
+
+        result = rasterize_layer(
+            self.layer,
+            calculator.params_from_settings(self.settings),
+            path,
+            cell_size=self.spin_cell_size.value(),
+            floors_field=self.combo_floors_field.currentData(),
+            default_floors=self.spin_floors.value(),
+            per_hectare=self.check_per_hectare.isChecked(),
+            feedback=feedback
+        )
+        progress.close()
+        if result is None:
+            return
+
+        raster_layer = QgsRasterLayer(result, f'{self.layer.name()} — плотность')
+        if not raster_layer.isValid():
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось открыть растр: {result}')
+            return
+        QgsProject.instance().addMapLayer(raster_layer)
+        self.accept()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Density raster output for Building Calculator
+
+Distributes per-building residents and parking demand onto a regular grid.
+A building covering several cells is split between them by the share of its
+footprint inside each cell; the shares of a whole chunk of buildings are
+accumulated into the grid with ``numpy.bincount``.
+"""
+
+import math
+import numpy as np
+from osgeo import gdal, osr
+from qgis.core import QgsFeatureRequest, QgsGeometry, QgsRectangle
+
+from .calculator import calculate_arrays
+from .layer_processor import create_distance_area, measure_area, feature_floors
+
+
+class DensityRaster:
+    """Grid accumulating per-building values by area share."""
+
+    BANDS = ('residents', 'parking')
+    DEFAULT_CELL_SIZE = 100.0
+
+    def __init__(self, extent, cell_size=DEFAULT_CELL_SIZE):
+        """Constructor.
+
+        :param extent: QgsRectangle covering all buildings, in layer units.
+        :param cell_size: Cell size in layer units.
+        """
+        self.cell_size = cell_size
+        self.x0 = extent.xMinimum()
+        self.y0 = extent.yMaximum()
+        self.cols = max(1, int(math.ceil(extent.width() / cell_size)))
+        self.rows = max(1, int(math.ceil(extent.height() / cell_size)))
+        self.grids = np.zeros((len(self.BANDS), self.rows * self.cols))
+
+    def cell_range(self, box):
+        """Clipped column and row range covered by a bounding box."""
+        cs = self.cell_size
+        col0 = min(max(int((box.xMinimum() - self.x0) // cs), 0), self.cols - 1)
+        col1 = min(max(int((box.xMaximum() - self.x0) // cs), 0), self.cols - 1)
+        row0 = min(max(int((self.y0 - box.yMaximum()) // cs), 0), self.rows - 1)
+        row1 = min(max(int((self.y0 - box.yMinimum()) // cs), 0), self.rows - 1)
+        return col0, col1, row0, row1
+
+    def cell_rect(self, col, row):
+        """Map extent of a cell."""
+        cs = self.cell_size
+        x = self.x0 + col * cs
+        y = self.y0 - row * cs
+        return QgsRectangle(x, y - cs, x + cs, y)
+
+    def add(self, geometries, values):
+        """Accumulate values of a chunk of buildings.
+
+        :param geometries: Footprint geometries.
+        :param values: Array of shape (len(BANDS), len(geometries)).
+        """
+        cells = []
+        owners = []
+        shares = []
+        for owner, geometry in enumerate(geometries):
+            col0, col1, row0, row1 = self.cell_range(geometry.boundingBox())
+            if col0 == col1 and row0 == row1:
+                cells.append(row0 * self.cols + col0)
+                owners.append(owner)
+                shares.append(1.0)
+                continue
+
+            # Footprint crosses cell borders: split by area share
+            total = geometry.area()
+            if total <= 0:
+                continue
+            for row in range(row0, row1 + 1):
+                for col in range(col0, col1 + 1):
+                    part = geometry.intersection(QgsGeometry.fromRect(self.cell_rect(col, row))).area()
+                    if part > 0:
+                        cells.append(row * self.cols + col)
+                        owners.append(owner)
+                        shares.append(part / total)
+
+        if not cells:
+            return
+        cells = np.asarray(cells, dtype=np.int64)
+        shares = np.asarray(shares)
+        owners = np.asarray(owners, dtype=np.int64)
+        for band in range(len(self.BANDS)):
+            self.grids[band] += np.bincount(
+                cells, weights=shares * values[band][owners], minlength=self.grids.shape[1]
+            )
+
+    def write(self, path, crs_wkt, per_hectare=False, driver='GTiff'):
+        """Write the grid as a two-band Float32 raster.
+
+        :param path: Output file; a ``/vsimem/`` path keeps it in memory.
+        :param per_hectare: Divide cell totals by the cell area in hectares.
+        """
+        dataset = gdal.GetDriverByName(driver).Create(
+            path, self.cols, self.rows, len(self.BANDS), gdal.GDT_Float32
+        )
+        dataset.SetGeoTransform((self.x0, self.cell_size, 0, self.y0, 0, -self.cell_size))
+        dataset.SetProjection(osr.SpatialReference(wkt=crs_wkt).ExportToWkt())
+
+        scale = 10000.0 / (self.cell_size * self.cell_size) if per_hectare else 1.0
+        for band, name in enumerate(self.BANDS):
+            raster_band = dataset.GetRasterBand(band + 1)
+            raster_band.SetDescription(name)
+            raster_band.WriteArray((self.grids[band] * scale).reshape(self.rows, self.cols))
+        dataset.FlushCache()
+        dataset = None
+        return path
+
+
+def rasterize_layer(layer, params, path, cell_size=DensityRaster.DEFAULT_CELL_SIZE,
+                    floors_field=None, default_floors=5, per_hectare=False,
+                    chunk_size=10000, feedback=None):
+    """Calculate all buildings of a layer and write the density raster.
+
+    :returns: Output path, or None if cancelled.
+    """
+    raster = DensityRaster(layer.extent(), cell_size)
+    floors_index = layer.fields().indexOf(floors_field) if floors_field else -1
+    distance_area = create_distance_area(layer.crs())
+
+    request = QgsFeatureRequest()
+    request.setSubsetOfAttributes([floors_index] if floors_index >= 0 else [])
+    total = max(layer.featureCount(), 1)
+    processed = 0
+    geometries, areas, floors = [], [], []
+
+    def flush():
+        total_area = np.asarray(areas) * np.asarray(floors)
+        _, residents, parking = calculate_arrays(total_area, params)
+        raster.add(geometries, np.vstack([residents, parking]))
+        geometries.clear()
+        areas.clear()
+        floors.clear()
+
+    for feature in layer.getFeatures(request):
+        geometry = feature.geometry()
+        if geometry.isEmpty():
+            continue
+        geometries.append(geometry)
+        areas.append(measure_area(geometry, distance_area))
+        floors.append(feature_floors(feature, floors_index, default_floors))
+        processed += 1
+        if len(geometries) >= chunk_size:
+            flush()
+            if feedback is not None:
+                if feedback.isCanceled():
+                    return None
+                feedback.setProgress(100.0 * processed / total)
+
+    if geometries:
+        flush()
+    return raster.write(path, layer.crs().toWkt(), per_hectare)
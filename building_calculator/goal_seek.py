@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Goal seek for Building Calculator
+
+Reverse calculation: the minimum floors or footprint area a building needs
+to reach a target number of apartments or residents, or the maximum it may
+have under a parking cap. The forward model of ``calculator`` is evaluated
+on numpy arrays and solved by bisection for all buildings at once, so the
+answers are always consistent with the forward calculation.
+"""
+
+import numpy as np
+
+from .calculator import calculate_arrays, types_exceeded, used_area
+
+
+TARGET_APARTMENTS = 'apartments'
+TARGET_RESIDENTS = 'residents'
+TARGET_PARKING_CAP = 'parking_cap'
+
+MAX_FLOORS = 200
+AREA_TOLERANCE = 0.01  # m²
+
+
+def target_met(total_area, target, value, params):
+    """Boolean array: does the total area meet the target.
+
+    For apartment and resident targets the result grows with the area
+    (False ... True), for a parking cap it shrinks (True ... False) above
+    ``min_total_area``. A building whose apartment types do not fit never
+    meets a target, so the solvers look for an area where they fit.
+    """
+    apartments, residents, parking = calculate_arrays(total_area, params)
+    fits = ~types_exceeded(total_area, params)
+    if target == TARGET_APARTMENTS:
+        return fits & (apartments >= value)
+    elif target == TARGET_RESIDENTS:
+        return fits & (residents >= value)
+    else:  # parking cap
+        return fits & (parking <= value)
+
+
+def min_total_area(params):
+    """Smallest total area the apartment types fit into."""
+    return float(used_area(params)) if params['use_types'] else 0.0
+
+
+def solve_floors(areas, target, value, params, max_floors=MAX_FLOORS):
+    """Solve the floors for every footprint area.
+
+    For apartment and resident targets this is the minimum number of floors
+    reaching the target, for a parking cap the maximum number of floors
+    staying under it.
+
+    :param areas: Footprint areas.
+    :param value: Target value, scalar or array of the same length.
+    :returns: Float array of floors, NaN where no floor count up to
+        ``max_floors`` satisfies the target.
+    """
+    areas = np.asarray(areas, dtype=np.float64)
+    value = np.broadcast_to(np.asarray(value, dtype=np.float64), areas.shape)
+    is_cap = target == TARGET_PARKING_CAP
+
+    def met(floors):
+        return target_met(areas * floors, target, value, params)
+
+    # Invariant: met(lo) != met(hi) for solvable buildings
+    lo = np.zeros(areas.shape)
+    hi = np.full(areas.shape, float(max_floors))
+    if is_cap:
+        # A cap is only searched from the first floor count the types fit
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lo = np.maximum(np.ceil(min_total_area(params) / areas), 1.0)
+        lo = np.where(np.isfinite(lo), np.minimum(lo, max_floors + 1), max_floors + 1)
+        solvable = (lo <= max_floors) & met(lo)
+        hi += 1
+    else:
+        solvable = met(hi)
+
+    while np.any(hi - lo > 1):
+        mid = np.floor((lo + hi) / 2)
+        ok = met(mid)
+        if is_cap:
+            lo = np.where(ok, mid, lo)
+            hi = np.where(ok, hi, mid)
+        else:
+            hi = np.where(ok, mid, hi)
+            lo = np.where(ok, lo, mid)
+
+    return np.where(solvable, lo if is_cap else hi, np.nan)
+
+
+def solve_footprint(floors, target, value, params, max_area=1e6, tolerance=AREA_TOLERANCE):
+    """Solve the footprint area for every floor count.
+
+    For apartment and resident targets this is the minimum footprint area
+    reaching the target, for a parking cap the maximum area staying under it.
+
+    :returns: Float array of areas, NaN where the target cannot be met
+        within ``max_area``.
+    """
+    floors = np.asarray(floors, dtype=np.float64)
+    value = np.broadcast_to(np.asarray(value, dtype=np.float64), floors.shape)
+    is_cap = target == TARGET_PARKING_CAP
+
+    def met(area):
+        return target_met(area * floors, target, value, params)
+
+    lo = np.zeros(floors.shape)
+    hi = np.full(floors.shape, float(max_area))
+    if is_cap:
+        # A cap is only searched from the first area the types fit into
+        lo = np.minimum(min_total_area(params) / floors, max_area)
+        solvable = met(lo)
+    else:
+        solvable = met(hi)
+
+    while np.any(hi - lo > tolerance):
+        mid = (lo + hi) / 2
+        ok = met(mid)
+        if is_cap:
+            lo = np.where(ok, mid, lo)
+            hi = np.where(ok, hi, mid)
+        else:
+            hi = np.where(ok, mid, hi)
+            lo = np.where(ok, lo, mid)
+
+    return np.where(solvable, lo if is_cap else hi, np.nan)
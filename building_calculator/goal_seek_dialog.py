@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Goal Seek Dialog for Building Calculator
+"""
+
+import numpy as np
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
+    QLabel, QSpinBox, QDoubleSpinBox, QPushButton, QGroupBox, QComboBox,
+    QMessageBox
+)
+
+from . import calculator
+from . import goal_seek
+from .layer_processor import read_layer, write_layer_field
+
+
+class GoalSeekDialog(QDialog):
+    """Dialog for solving floors or footprint area needed to reach a target."""
+
+    FIELD_FLOORS = 'bc_need_fl'
+    FIELD_FOOTPRINT = 'bc_need_ar'
+
+    def __init__(self, parent=None, layer=None, settings=None):
+        """Constructor.
+
+        :param layer: Polygon layer to solve for.
+        """
+        super().__init__(parent)
+        self.layer = layer
+        self.settings = settings
+        self.setup_ui()
+        self.on_target_changed(0)
+
+    def setup_ui(self):
+        """Set up the user interface."""
+        self.setWindowTitle('Building Calculator - Подбор параметров')
+        self.setMinimumWidth(450)
+
+        layout = QVBoxLayout()
+
+        # Target
+        target_group = QGroupBox('Цель')
+        target_layout = QFormLayout()
+
+        self.combo_target = QComboBox()
+        self.combo_target.addItem('Жителей не менее', goal_seek.TARGET_RESIDENTS)
+        self.combo_target.addItem('Квартир не менее', goal_seek.TARGET_APARTMENTS)
+        self.combo_target.addItem('Парковочных мест не более', goal_seek.TARGET_PARKING_CAP)
+        self.combo_target.currentIndexChanged.connect(self.on_target_changed)
+        target_layout.addRow('Цель:', self.combo_target)
+
+        self.spin_value = QDoubleSpinBox()
+        self.spin_value.setRange(0.0, 1000000.0)
+        self.spin_value.setDecimals(0)
+        self.spin_value.setValue(100.0)
+        target_layout.addRow('Значение:', self.spin_value)
+
+        self.combo_value_field = QComboBox()
+        self.combo_value_field.addItem('— Одно значение для всех —', None)
+        self.combo_floors_field = QComboBox()
+        self.combo_floors_field.addItem('— Не использовать —', None)
+        for field in self.layer.fields():
+            if field.isNumeric():
+                self.combo_value_field.addItem(field.name(), field.name())
+                self.combo_floors_field.addItem(field.name(), field.name())
+        target_layout.addRow('Значение из поля:', self.combo_value_field)
+
+        target_group.setLayout(target_layout)
+        layout.addWidget(target_group)
+
+        # Unknown
+        solve_group = QGroupBox('Искомая величина')
+        solve_layout = QFormLayout()
+
+        self.combo_solve = QComboBox()
+        self.combo_solve.addItem('Количество этажей', 'floors')
+        self.combo_solve.addItem('Площадь застройки', 'footprint')
+        self.combo_solve.currentIndexChanged.connect(self.on_target_changed)
+        solve_layout.addRow('Найти:', self.combo_solve)
+
+        solve_layout.addRow('Поле этажности:', self.combo_floors_field)
+
+        self.spin_floors = QSpinBox()
+        self.spin_floors.setRange(1, goal_seek.MAX_FLOORS)
+        self.spin_floors.setValue(5)
+        solve_layout.addRow('Этажей по умолчанию:', self.spin_floors)
+
+        self.spin_max_floors = QSpinBox()
+        self.spin_max_floors.setRange(1, goal_seek.MAX_FLOORS)
+        self.spin_max_floors.setValue(goal_seek.MAX_FLOORS)
+        solve_layout.addRow('Максимум этажей:', self.spin_max_floors)
+
+        self.label_output = QLabel()
+        self.label_output.setStyleSheet('font-style: italic; color: #888;')
+        solve_layout.addRow(self.label_output)
+
+        solve_group.setLayout(solve_layout)
+        layout.addWidget(solve_group)
+
+        # Buttons
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+
+        self.btn_close = QPushButton('Закрыть')
+        self.btn_close.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.btn_close)
+
+        self.btn_run = QPushButton('Рассчитать')
+        self.btn_run.clicked.connect(self.run)
+        self.btn_run.setDefault(True)
+        buttons_layout.addWidget(self.btn_run)
+
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def on_target_changed(self, index):
+        """Update the hint about what is solved and where it is written."""
+        is_cap = self.combo_target.currentData() == goal_seek.TARGET_PARKING_CAP
+        if self.combo_solve.currentData() == 'floors':
+            what = 'Максимальное' if is_cap else 'Минимальное'
+            self.label_output.setText(f'{what} число этажей → поле {self.FIELD_FLOORS}')
+        else:
+            what = 'Максимальная' if is_cap else 'Минимальная'
+            self.label_output.setText(f'{what} площадь застройки → поле {self.FIELD_FOOTPRINT}')
+
+    def run(self):
+        """Solve for all buildings of the layer and write the results."""
+        if self.layer.isEditable():
+            QMessageBox.warning(self, 'Ошибка', 'Завершите редактирование слоя перед расчётом.')
+            return
+
+        params = calculator.params_from_settings(self.settings)
+        target = self.combo_target.currentData()
+        fids, areas, floors, values = read_layer(
+            self.layer,
+            floors_field=self.combo_floors_field.currentData(),
+            default_floors=self.spin_floors.value(),
+            value_field=self.combo_value_field.currentData()
+        )
+        if values is None:
+            values = self.spin_value.value()
+        is_cap = target == goal_seek.TARGET_PARKING_CAP
+
+        if self.combo_solve.currentData() == 'floors':
+            solved = goal_seek.solve_floors(areas, target, values, params, self.spin_max_floors.value())
+            field_name = self.FIELD_FLOORS
+            current = floors
+        else:
+            solved = goal_seek.solve_footprint(floors, target, values, params)
+            field_name = self.FIELD_FOOTPRINT
+            current = areas
+        write_layer_field(self.layer, field_name, fids, solved)
+
+        solvable = ~np.isnan(solved)
+        if is_cap:
+            satisfied = solvable & (current <= solved)
+        else:
+            satisfied = solvable & (current >= solved)
+        QMessageBox.information(
+            self, 'Готово',
+            f'Зданий: {len(fids):,}\n'
+            f'Цель достижима: {int(solvable.sum()):,}\n'
+            f'Цель уже выполнена: {int(satisfied.sum()):,}\n'
+            f'Результат записан в поле {field_name}'
+        )
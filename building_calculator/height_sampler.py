@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Height raster sampling for Building Calculator
+
+Estimates the number of floors of building footprints from a normalized DSM
+or building height raster. Footprints are grouped by raster tile; for every
+tile only the covering window is read, all footprints of the tile are burnt
+into one label mask and the zonal statistics are computed with array
+operations.
+"""
+
+import math
+import numpy as np
+from osgeo import gdal, ogr, osr
+from qgis.core import QgsCoordinateTransform, QgsGeometry, QgsProject
+
+
+def zonal_statistic(labels, values, count, statistic='median'):
+    """Compute a statistic of ``values`` for every label 1..count.
+
+    :param labels: Integer label array, 0 is background.
+    :param values: Value array of the same shape, NaN marks nodata.
+    :returns: Array of ``count`` values, NaN for labels without valid pixels.
+    """
+    labels = labels.ravel()
+    values = values.ravel()
+    mask = (labels > 0) & ~np.isnan(values)
+    labels = labels[mask] - 1
+    values = values[mask]
+
+    result = np.full(count, np.nan)
+    counts = np.bincount(labels, minlength=count)
+    has_values = counts > 0
+
+    if statistic == 'mean':
+        sums = np.bincount(labels, weights=values, minlength=count)
+        result[has_values] = sums[has_values] / counts[has_values]
+    elif statistic == 'max':
+        maximums = np.full(count, -np.inf)
+        np.maximum.at(maximums, labels, values)
+        result[has_values] = maximums[has_values]
+    else:  # median
+        # Sort by label, then by value; each label is a contiguous run
+        order = np.lexsort((values, labels))
+        values = values[order]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        lower = starts[has_values] + (counts[has_values] - 1) // 2
+        upper = starts[has_values] + counts[has_values] // 2
+        result[has_values] = (values[lower] + values[upper]) / 2.0
+    return result
+
+
+class HeightRasterSampler:
+    """Zonal sampling of a height raster inside building footprints."""
+
+    STATISTICS = ('median', 'mean', 'max')
+    DEFAULT_FLOOR_HEIGHT = 3.0
+    DEFAULT_TILE_SIZE = 1024
+
+    def __init__(self, raster_layer, vector_crs, floor_height=DEFAULT_FLOOR_HEIGHT,
+                 statistic='median', band=1, tile_size=DEFAULT_TILE_SIZE):
+        """Constructor.
+
+        :param raster_layer: GDAL raster layer with heights in meters.
+        :param vector_crs: CRS of the footprint geometries.
+        :param floor_height: Height of one floor in meters.
+        """
+        self.source = raster_layer.source()
+        self.floor_height = floor_height
+        self.statistic = statistic
+        self.band_number = band
+        self.tile_size = tile_size
+
+        self.dataset = gdal.Open(self.source, gdal.GA_ReadOnly)
+        if self.dataset is None:
+            raise ValueError(f'Cannot open raster: {self.source}')
+        self.band = self.dataset.GetRasterBand(band)
+        self.nodata = self.band.GetNoDataValue()
+        self.geotransform = self.dataset.GetGeoTransform()
+        if self.geotransform[2] != 0 or self.geotransform[4] != 0:
+            raise ValueError('Rotated rasters are not supported')
+        self.width = self.dataset.RasterXSize
+        self.height = self.dataset.RasterYSize
+        self.projection = self.dataset.GetProjection()
+
+        self.transform = None
+        if raster_layer.crs() != vector_crs:
+            self.transform = QgsCoordinateTransform(
+                vector_crs, raster_layer.crs(), QgsProject.instance()
+            )
+
+    def signature(self):
+        """Parameters that affect the result, used for checkpoints."""
+        return {
+            'source': self.source,
+            'floor_height': self.floor_height,
+            'statistic': self.statistic,
+            'band': self.band_number,
+        }
+
+    def pixel_window(self, xmin, ymin, xmax, ymax):
+        """Convert a map extent to a clipped pixel window (col, row, cols, rows)."""
+        x0, dx, _, y0, _, dy = self.geotransform
+        col0 = max(int(math.floor((xmin - x0) / dx)), 0)
+        col1 = min(int(math.ceil((xmax - x0) / dx)), self.width)
+        row0 = max(int(math.floor((ymax - y0) / dy)), 0)
+        row1 = min(int(math.ceil((ymin - y0) / dy)), self.height)
+        return col0, row0, col1 - col0, row1 - row0
+
+    def read_window(self, col, row, cols, rows):
+        """Read a raster window as float array with NaN for nodata."""
+        values = self.band.ReadAsArray(col, row, cols, rows).astype(np.float64)
+        if self.nodata is not None:
+            values[values == self.nodata] = np.nan
+        return values
+
+    def rasterize(self, wkbs, col, row, cols, rows):
+        """Burn footprints into a label mask of the window (label = index + 1)."""
+        x0, dx, _, y0, _, dy = self.geotransform
+        target = gdal.GetDriverByName('MEM').Create('', cols, rows, 1, gdal.GDT_Int32)
+        target.SetGeoTransform((x0 + col * dx, dx, 0, y0 + row * dy, 0, dy))
+        target.SetProjection(self.projection)
+
+        source = ogr.GetDriverByName('Memory').CreateDataSource('')
+        srs = osr.SpatialReference(wkt=self.projection) if self.projection else None
+        layer = source.CreateLayer('footprints', srs, ogr.wkbUnknown)
+        layer.CreateField(ogr.FieldDefn('label', ogr.OFTInteger))
+        definition = layer.GetLayerDefn()
+        for label, wkb in wkbs:
+            feature = ogr.Feature(definition)
+            feature.SetField('label', label)
+            feature.SetGeometry(ogr.CreateGeometryFromWkb(wkb))
+            layer.CreateFeature(feature)
+
+        gdal.RasterizeLayer(target, [1], layer, options=['ATTRIBUTE=label'])
+        return target.GetRasterBand(1).ReadAsArray()
+
+    def sample_heights(self, geometries):
+        """Sample the height statistic for every geometry.
+
+        :returns: Array of heights, NaN where no valid pixels were found.
+        """
+        heights = np.full(len(geometries), np.nan)
+        x0, dx, _, y0, _, dy = self.geotransform
+
+        # Group footprints by the raster tile of their bounding box center
+        tiles = {}
+        for index, geometry in enumerate(geometries):
+            if geometry is None or geometry.isEmpty():
+                continue
+            if self.transform is not None:
+                geometry = QgsGeometry(geometry)
+                geometry.transform(self.transform)
+            box = geometry.boundingBox()
+            center_col = int((box.center().x() - x0) / dx) // self.tile_size
+            center_row = int((box.center().y() - y0) / dy) // self.tile_size
+            tiles.setdefault((center_col, center_row), []).append((index, geometry, box))
+
+        for members in tiles.values():
+            xmin = min(box.xMinimum() for _, _, box in members)
+            ymin = min(box.yMinimum() for _, _, box in members)
+            xmax = max(box.xMaximum() for _, _, box in members)
+            ymax = max(box.yMaximum() for _, _, box in members)
+            col, row, cols, rows = self.pixel_window(xmin, ymin, xmax, ymax)
+            if cols <= 0 or rows <= 0:
+                continue
+
+            values = self.read_window(col, row, cols, rows)
+            labels = self.rasterize(
+                [(label + 1, bytes(geometry.asWkb())) for label, (_, geometry, _) in enumerate(members)],
+                col, row, cols, rows
+            )
+            stats = zonal_statistic(labels, values, len(members), self.statistic)
+            heights[[index for index, _, _ in members]] = stats
+        return heights
+
+    def sample_floors(self, geometries):
+        """Estimate floors for every geometry.
+
+        :returns: List of floors, None where the height is unknown.
+        """
+        heights = self.sample_heights(geometries)
+        return [
+            None if math.isnan(h) or h <= 0 else max(1, int(round(h / self.floor_height)))
+            for h in heights
+        ]
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Layer Calculation Dialog for Building Calculator
+"""
+
+from qgis.PyQt.QtCore import Qt, QCoreApplication
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
+    QLabel, QSpinBox, QDoubleSpinBox, QPushButton, QGroupBox, QComboBox, QCheckBox,
+    QProgressDialog, QMessageBox
+)
+from qgis.core import QgsFeedback, QgsMapLayerProxyModel
+from qgis.gui import QgsMapLayerComboBox
+
+from . import calculator
+from .layer_processor import LayerProcessor
+from .height_sampler import HeightRasterSampler
+from . import parallel
+from .overlap import OverlapResolver
+
+
+class LayerCalculationDialog(QDialog):
+    """Dialog for calculating all buildings of a polygon layer."""
+
+    def __init__(self, parent=None, layer=None, settings=None):
+        """Constructor.
+
+        :param layer: Polygon layer to process.
+        """
+        super().__init__(parent)
+        self.layer = layer
+        self.settings = settings
+        self.setup_ui()
+        self.update_checkpoint_info()
+
+    def setup_ui(self):
+        """Set up the user interface."""
+        self.setWindowTitle('Building Calculator - Расчёт слоя')
+        self.setMinimumWidth(450)
+
+        layout = QVBoxLayout()
+
+        # Layer info
+        info_group = QGroupBox('Слой')
+        info_layout = QFormLayout()
+        info_layout.addRow('Слой:', QLabel(f'<b>{self.layer.name()}</b>'))
+        info_layout.addRow('Объектов:', QLabel(f'{self.layer.featureCount():,}'))
+
+        # Floors source
+        self.combo_floors_field = QComboBox()
+        self.combo_floors_field.addItem('— Не использовать —', None)
+        for field in self.layer.fields():
+            if field.isNumeric():
+                self.combo_floors_field.addItem(field.name(), field.name())
+        self.combo_floors_field.currentIndexChanged.connect(self.update_checkpoint_info)
+        info_layout.addRow('Поле этажности:', self.combo_floors_field)
+
+        self.spin_floors = QSpinBox()
+        self.spin_floors.setRange(1, 200)
+        self.spin_floors.setValue(5)
+        self.spin_floors.valueChanged.connect(self.update_checkpoint_info)
+        info_layout.addRow('Этажей по умолчанию:', self.spin_floors)
+
+        info_group.setLayout(info_layout)
+        layout.addWidget(info_group)
+
+        # Floors from height raster
+        self.height_group = QGroupBox('Этажность по растру высот')
+        self.height_group.setCheckable(True)
+        self.height_group.setChecked(False)
+        self.height_group.toggled.connect(self.update_checkpoint_info)
+        height_layout = QFormLayout()
+
+        self.combo_height_layer = QgsMapLayerComboBox()
+        self.combo_height_layer.setFilters(QgsMapLayerProxyModel.RasterLayer)
+        self.combo_height_layer.layerChanged.connect(self.update_checkpoint_info)
+        height_layout.addRow('Растр высот (nDSM):', self.combo_height_layer)
+
+        self.combo_height_statistic = QComboBox()
+        self.combo_height_statistic.addItem('Медиана', 'median')
+        self.combo_height_statistic.addItem('Среднее', 'mean')
+        self.combo_height_statistic.addItem('Максимум', 'max')
+        self.combo_height_statistic.currentIndexChanged.connect(self.update_checkpoint_info)
+        height_layout.addRow('Статистика:', self.combo_height_statistic)
+
+        self.spin_floor_height = QDoubleSpinBox()
+        self.spin_floor_height.setRange(2.0, 10.0)
+        self.spin_floor_height.setValue(HeightRasterSampler.DEFAULT_FLOOR_HEIGHT)
+        self.spin_floor_height.setSuffix(' м')
+        self.spin_floor_height.setDecimals(2)
+        self.spin_floor_height.valueChanged.connect(self.update_checkpoint_info)
+        height_layout.addRow('Высота этажа:', self.spin_floor_height)
+
+        self.height_group.setLayout(height_layout)
+        layout.addWidget(self.height_group)
+
+        # Processing options
+        processing_group = QGroupBox('Обработка')
+        processing_layout = QFormLayout()
+
+        self.spin_chunk_size = QSpinBox()
+        self.spin_chunk_size.setRange(100, 1000000)
+        self.spin_chunk_size.setSingleStep(1000)
+        self.spin_chunk_size.setValue(LayerProcessor.DEFAULT_CHUNK_SIZE)
+        processing_layout.addRow('Объектов в блоке:', self.spin_chunk_size)
+
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(1, parallel.default_workers())
+        self.spin_workers.setValue(1)
+        self.spin_workers.setToolTip(
+            'Количество процессов для расчёта; 1 — без параллельной обработки. '
+            'Используется для файловых слоёв (OGR) в метрической проекции без растра высот, '
+            'остальные слои считаются в одном процессе'
+        )
+        self.spin_workers.valueChanged.connect(self.update_checkpoint_info)
+        processing_layout.addRow('Процессов:', self.spin_workers)
+
+        self.check_overlaps = QCheckBox('Не учитывать перекрытия контуров дважды')
+        self.check_overlaps.setToolTip(
+            'Перекрывающиеся контуры объединяются; общая часть считается один раз '
+            'по этажности самого высокого здания'
+        )
+        self.check_overlaps.toggled.connect(self.update_checkpoint_info)
+        processing_layout.addRow(self.check_overlaps)
+
+        self.check_restart = QCheckBox('Начать заново')
+        processing_layout.addRow(self.check_restart)
+
+        self.label_checkpoint = QLabel()
+        self.label_checkpoint.setStyleSheet('font-style: italic; color: #888;')
+        processing_layout.addRow(self.label_checkpoint)
+
+        processing_group.setLayout(processing_layout)
+        layout.addWidget(processing_group)
+
+        # Buttons
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+
+        self.btn_close = QPushButton('Закрыть')
+        self.btn_close.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.btn_close)
+
+        self.btn_run = QPushButton('Рассчитать')
+        self.btn_run.clicked.connect(self.run)
+        self.btn_run.setDefault(True)
+        buttons_layout.addWidget(self.btn_run)
+
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def create_height_sampler(self):
+        """Create a height raster sampler, or None if not used."""
+        raster_layer = self.combo_height_layer.currentLayer()
+        if not self.height_group.isChecked() or raster_layer is None:
+            return None
+        return HeightRasterSampler(
+            raster_layer,
+            self.layer.crs(),
+            floor_height=self.spin_floor_height.value(),
+            statistic=self.combo_height_statistic.currentData()
+        )
+
+    def create_processor(self, footprint_shares=None):
+        """Create a layer processor from the dialog values."""
+        return LayerProcessor(
+            self.layer,
+            calculator.params_from_settings(self.settings),
+            self.settings,
+            floors_field=self.combo_floors_field.currentData(),
+            default_floors=self.spin_floors.value(),
+            chunk_size=self.spin_chunk_size.value(),
+            height_sampler=self.create_height_sampler(),
+            workers=self.spin_workers.value(),
+            footprint_shares=footprint_shares
+        )
+
+    def update_checkpoint_info(self):
+        """Show whether an interrupted run can be resumed."""
+        footprint_shares = {} if self.check_overlaps.isChecked() else None
+        try:
+            checkpoint = self.create_processor(footprint_shares).load_checkpoint()
+        except ValueError:
+            checkpoint = None
+        if checkpoint:
+            self.label_checkpoint.setText(
+                f'Найден незавершённый расчёт: обработано {checkpoint["processed"]:,} объектов'
+            )
+        else:
+            self.label_checkpoint.setText('')
+
+    def run(self):
+        """Run the chunked calculation with a progress dialog."""
+        if self.layer.isEditable():
+            QMessageBox.warning(self, 'Ошибка', 'Завершите редактирование слоя перед расчётом.')
+            return
+
+        try:
+            processor = self.create_processor()
+        except ValueError as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось открыть растр высот: {e}')
+            return
+        if not processor.can_write():
+            QMessageBox.warning(self, 'Ошибка', 'Источник слоя не поддерживает запись атрибутов.')
+            return
+
+        progress = QProgressDialog('Расчёт зданий...', 'Остановить', 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        feedback = QgsFeedback()
+        progress.canceled.connect(feedback.cancel)
+
+        def on_progress(value):
+            progress.setValue(int(value))
+            QCoreApplication.processEvents()
+
+        feedback.progressChanged.connect(on_progress)
+
+        if self.check_overlaps.isChecked():
+            progress.setLabelText('Поиск перекрывающихся контуров...')
+            resolver = OverlapResolver(
+                self.layer,
+                floors_field=self.combo_floors_field.currentData(),
+                default_floors=self.spin_floors.value(),
+                height_sampler=processor.height_sampler
+            )
+            footprint_shares = resolver.footprint_shares(feedback)
+            if feedback.isCanceled():
+                progress.close()
+                return
+            processor = self.create_processor(footprint_shares)
+            progress.setLabelText('Расчёт зданий...')
+
+        try:
+            result = processor.run(feedback, restart=self.check_restart.isChecked())
+        except RuntimeError as e:
+            progress.close()
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось записать результаты: {e}')
+            self.update_checkpoint_info()
+            return
+        progress.close()
+
+        if result['finished']:
+            QMessageBox.information(
+                self, 'Готово',
+                f'Обработано объектов: {result["processed"]:,}\n'
+                f'Квартир: {result["apartments"]:,}\n'
+                f'Жителей: {int(result["residents"]):,}\n'
+                f'Парковочных мест: {result["parking"]:,}'
+            )
+            self.accept()
+        else:
+            self.check_restart.setChecked(False)
+            self.update_checkpoint_info()
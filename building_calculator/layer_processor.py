@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+"""
+Layer-wide calculation for Building Calculator
+
+Processes a whole polygon layer in fixed-size chunks of features. Results of
+each chunk are written to the layer and a checkpoint is stored in QSettings,
+so an interrupted run resumes after the last committed chunk.
+"""
+
+import hashlib
+import json
+import numpy as np
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (
+    QgsCoordinateTransform, QgsDistanceArea, QgsFeatureRequest, QgsField, QgsProject,
+    QgsProviderRegistry, QgsVectorDataProvider
+)
+
+from . import calculator
+from . import parallel
+
+
+def create_distance_area(crs):
+    """Create an ellipsoidal area calculator for geographic CRS.
+
+    Returns None for projected CRS, where planar area is already in map units.
+    """
+    if not crs.isGeographic():
+        return None
+    da = QgsDistanceArea()
+    da.setSourceCrs(crs, QgsProject.instance().transformContext())
+    da.setEllipsoid(QgsProject.instance().ellipsoid())
+    return da
+
+
+def measure_area(geometry, distance_area=None):
+    """Measure polygon area, using ellipsoidal calculation if given."""
+    if distance_area is not None:
+        return distance_area.measureArea(geometry)
+    return geometry.area()
+
+
+def feature_floors(feature, floors_index, default_floors):
+    """Get number of floors from a feature attribute or the default."""
+    if floors_index < 0:
+        return default_floors
+    try:
+        floors = int(feature.attributes()[floors_index])
+    except (TypeError, ValueError):
+        return default_floors
+    return floors if floors > 0 else default_floors
+
+
+
+def sorted_feature_ids(layer):
+    """Feature ids of a layer in ascending order.
+
+    Only the ids are fetched, without geometry and attributes.
+    """
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setNoAttributes()
+    ids = np.fromiter((feature.id() for feature in layer.getFeatures(request)), dtype=np.int64)
+    ids.sort()
+    return ids
+
+
+def read_layer(layer, floors_field=None, default_floors=5, value_field=None, feedback=None,
+               centroid_crs=None):
+    """Read feature ids, footprint areas, floors and values of a layer.
+
+    The values are collected in lists, so the result does not depend on
+    ``featureCount()``, which may be unknown (-1) or stale.
+
+    :param value_field: Optional numeric attribute to read; values that
+        are not numbers become NaN.
+    :param centroid_crs: Also read the footprint centroids, transformed
+        to this CRS.
+    :returns: Tuple of numpy arrays (fids, areas, floors, values); values is
+        None without ``value_field``. With ``centroid_crs`` a fifth (n, 2)
+        array of centroid coordinates follows, NaN for empty geometries.
+    """
+    fields = layer.fields()
+    floors_index = fields.indexOf(floors_field) if floors_field else -1
+    value_index = fields.indexOf(value_field) if value_field else -1
+    distance_area = create_distance_area(layer.crs())
+
+    transform = None
+    if centroid_crs is not None:
+        transform = QgsCoordinateTransform(layer.crs(), centroid_crs, QgsProject.instance())
+
+    request = QgsFeatureRequest()
+    request.setSubsetOfAttributes([i for i in (floors_index, value_index) if i >= 0])
+
+    total = max(layer.featureCount(), 1)
+    fids, areas, floors, values, centroids = [], [], [], [], []
+    for feature in layer.getFeatures(request):
+        geometry = feature.geometry()
+        fids.append(feature.id())
+        areas.append(measure_area(geometry, distance_area))
+        if transform is not None:
+            if geometry.isEmpty():
+                centroids.append((np.nan, np.nan))
+            else:
+                point = transform.transform(geometry.centroid().asPoint())
+                centroids.append((point.x(), point.y()))
+        floors.append(feature_floors(feature, floors_index, default_floors))
+        if value_index >= 0:
+            try:
+                values.append(float(feature.attributes()[value_index]))
+            except (TypeError, ValueError):
+                values.append(np.nan)
+        if feedback is not None and len(fids) % 10000 == 0:
+            if feedback.isCanceled():
+                break
+            feedback.setProgress(min(50.0 * len(fids) / total, 50.0))
+
+    result = (
+        np.array(fids, dtype=np.int64),
+        np.array(areas, dtype=np.float64),
+        np.array(floors, dtype=np.float64),
+        np.array(values, dtype=np.float64) if value_index >= 0 else None,
+    )
+    if transform is not None:
+        result += (np.array(centroids, dtype=np.float64).reshape(-1, 2),)
+    return result
+
+
+def write_layer_fields(layer, fids, columns, chunk_size=10000):
+    """Write value arrays to Double fields, creating missing fields.
+
+    :param columns: Dict of field name to array aligned with ``fids``;
+        NaN is written as NULL.
+    """
+    provider = layer.dataProvider()
+    missing = [
+        QgsField(name, QVariant.Double) for name in columns
+        if provider.fields().indexOf(name) < 0
+    ]
+    if missing:
+        provider.addAttributes(missing)
+        layer.updateFields()
+    indexes = [provider.fields().indexOf(name) for name in columns]
+    arrays = list(columns.values())
+
+    for start in range(0, len(fids), chunk_size):
+        changes = {}
+        for offset, fid in enumerate(fids[start:start + chunk_size]):
+            changes[int(fid)] = {
+                index: None if np.isnan(values[start + offset]) else float(values[start + offset])
+                for index, values in zip(indexes, arrays)
+            }
+        provider.changeAttributeValues(changes)
+    layer.triggerRepaint()
+
+
+def write_layer_field(layer, field_name, fids, values, chunk_size=10000):
+    """Write a value array to a Double field, creating it if needed."""
+    write_layer_fields(layer, fids, {field_name: values}, chunk_size)
+
+class LayerProcessor:
+    """Chunked calculation over all features of a polygon layer."""
+
+    KEY_CHECKPOINTS = 'BuildingCalculator/checkpoints'
+    DEFAULT_CHUNK_SIZE = 5000
+
+    # Output fields written to the layer
+    FIELD_APARTMENTS = 'bc_apts'
+    FIELD_RESIDENTS = 'bc_resid'
+    FIELD_PARKING = 'bc_parking'
+    FIELD_PARKING_AREA = 'bc_park_ar'
+    OUTPUT_FIELDS = [
+        (FIELD_APARTMENTS, QVariant.Int),
+        (FIELD_RESIDENTS, QVariant.Double),
+        (FIELD_PARKING, QVariant.Int),
+        (FIELD_PARKING_AREA, QVariant.Double),
+    ]
+
+    def __init__(self, layer, params, settings, floors_field=None,
+                 default_floors=5, chunk_size=DEFAULT_CHUNK_SIZE, height_sampler=None,
+                 workers=1, footprint_shares=None):
+        """Constructor.
+
+        :param layer: Polygon layer to process.
+        :param params: Calculation parameters, see calculator.params_from_settings.
+        :param settings: QSettings used to store checkpoints.
+        :param floors_field: Name of the floors attribute, or None to use default_floors.
+        :param height_sampler: Optional HeightRasterSampler to estimate floors from a height raster.
+        :param workers: Number of worker processes; 1 calculates in this process.
+        :param footprint_shares: Optional dict of fid to the counted share of
+            the footprint, see OverlapResolver.footprint_shares.
+        """
+        self.layer = layer
+        self.params = params
+        self.settings = settings
+        self.floors_field = floors_field
+        self.default_floors = default_floors
+        self.chunk_size = max(1, int(chunk_size))
+        self.height_sampler = height_sampler
+        self.workers = max(1, int(workers))
+        self.footprint_shares = footprint_shares or {}
+        self.deduplicate = footprint_shares is not None
+
+    def checkpoint_key(self):
+        """Settings key of the checkpoint for this layer and parameters."""
+        signature = json.dumps({
+            'source': self.layer.source(),
+            'params': self.params,
+            'floors_field': self.floors_field,
+            'default_floors': self.default_floors,
+            'height': self.height_sampler.signature() if self.height_sampler else None,
+            'overlaps': self.deduplicate,
+            # Workers measure areas with OGR, not with QgsGeometry.area()
+            'parallel': self.worker_source() is not None,
+        }, sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha1(signature.encode('utf-8')).hexdigest()
+        return f'{self.KEY_CHECKPOINTS}/{digest}'
+
+    def load_checkpoint(self):
+        """Load the stored checkpoint, or None if there is none."""
+        value = self.settings.value(self.checkpoint_key(), None)
+        if not value:
+            return None
+        try:
+            return json.loads(value)
+        except:
+            return None
+
+    def save_checkpoint(self, checkpoint):
+        """Store the checkpoint after a committed chunk."""
+        self.settings.setValue(self.checkpoint_key(), json.dumps(checkpoint))
+        self.settings.sync()
+
+    def clear_checkpoint(self):
+        """Remove the stored checkpoint."""
+        self.settings.remove(self.checkpoint_key())
+
+    def can_write(self):
+        """Check that the provider can add fields and change attributes."""
+        caps = self.layer.dataProvider().capabilities()
+        return bool(caps & QgsVectorDataProvider.AddAttributes) and \
+            bool(caps & QgsVectorDataProvider.ChangeAttributeValues)
+
+    def ensure_output_fields(self):
+        """Add missing output fields and return their indexes."""
+        provider = self.layer.dataProvider()
+        missing = [
+            QgsField(name, field_type) for name, field_type in self.OUTPUT_FIELDS
+            if provider.fields().indexOf(name) < 0
+        ]
+        if missing:
+            provider.addAttributes(missing)
+            self.layer.updateFields()
+        fields = provider.fields()
+        return [fields.indexOf(name) for name, _ in self.OUTPUT_FIELDS]
+
+    def run(self, feedback=None, restart=False):
+        """Process the layer chunk by chunk.
+
+        The sorted feature ids are read once; every chunk is then fetched
+        by its ids, so only the features of the current chunk are held in
+        memory and a resumed run starts directly after the last committed
+        feature id. With several workers (see ``worker_source``) each chunk
+        is split into contiguous feature id shards that are read and
+        calculated in a process pool, and the results are written back in
+        feature id order.
+
+        :param feedback: Optional QgsFeedback for progress and cancellation.
+        :param restart: Ignore an existing checkpoint and start over.
+        :returns: Checkpoint dict with totals and a ``finished`` flag.
+            The checkpoint is removed once the whole layer is processed.
+        :raises RuntimeError: If the provider rejects a chunk; the checkpoint
+            stays at the last committed chunk.
+        """
+        if restart:
+            self.clear_checkpoint()
+        checkpoint = self.load_checkpoint() or {
+            'last_fid': None,
+            'processed': 0,
+            'apartments': 0,
+            'residents': 0.0,
+            'parking': 0,
+            'parking_area': 0.0,
+            'finished': False,
+        }
+
+        output_indexes = self.ensure_output_fields()
+        provider = self.layer.dataProvider()
+        floors_index = provider.fields().indexOf(self.floors_field) if self.floors_field else -1
+        distance_area = create_distance_area(self.layer.crs())
+
+        ids = sorted_feature_ids(provider)
+        start = 0
+        if checkpoint['last_fid'] is not None:
+            start = int(np.searchsorted(ids, checkpoint['last_fid'], side='right'))
+
+        total = max(len(ids), 1)
+        source = self.worker_source()
+        pool = parallel.create_pool(self.workers) if source is not None else None
+
+        def calculate_ids(chunk_ids):
+            if pool is not None:
+                return parallel.calculate_chunk(
+                    pool, source, self.params, chunk_ids, self.workers,
+                    self.floors_field, self.default_floors, self.footprint_shares
+                )
+            request = QgsFeatureRequest()
+            request.setFilterFids(set(chunk_ids.tolist()))
+            request.setSubsetOfAttributes([floors_index] if floors_index >= 0 else [])
+            # Providers return the requested ids in any order
+            chunk = sorted(provider.getFeatures(request), key=lambda feature: feature.id())
+            floors_list = self.chunk_floors(chunk, floors_index)
+            return [
+                (feature.id(), self.calculate_feature(feature, floors, distance_area))
+                for feature, floors in zip(chunk, floors_list)
+            ]
+
+        def commit_chunk(results):
+            changes = {}
+            for fid, result in results:
+                changes[fid] = dict(zip(output_indexes, [
+                    result['apartments'],
+                    result['residents'],
+                    result['parking'],
+                    result['parking_area'],
+                ]))
+                checkpoint['last_fid'] = fid
+                checkpoint['processed'] += 1
+                checkpoint['apartments'] += result['apartments']
+                checkpoint['residents'] += result['residents']
+                checkpoint['parking'] += result['parking'] or 0
+                checkpoint['parking_area'] += result['parking_area'] or 0
+
+            if not provider.changeAttributeValues(changes):
+                errors = provider.errors()
+                raise RuntimeError(errors[-1] if errors else 'changeAttributeValues failed')
+            self.save_checkpoint(checkpoint)
+            if feedback is not None:
+                feedback.setProgress(100.0 * checkpoint['processed'] / total)
+
+        try:
+            for chunk_start in range(start, len(ids), self.chunk_size):
+                commit_chunk(calculate_ids(ids[chunk_start:chunk_start + self.chunk_size]))
+                if feedback is not None and feedback.isCanceled():
+                    self.layer.triggerRepaint()
+                    return checkpoint
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.clear_checkpoint()
+        checkpoint['finished'] = True
+        self.layer.triggerRepaint()
+        return checkpoint
+
+    def calculate_feature(self, feature, floors, distance_area):
+        """Calculate a feature, counting only its share of overlapping footprints."""
+        area = measure_area(feature.geometry(), distance_area)
+        if feature.id() in self.footprint_shares:
+            return calculator.calculate_share(area, floors, self.params, self.footprint_shares[feature.id()])
+        return calculator.calculate(area, floors, self.params)
+
+    def worker_source(self):
+        """Decoded OGR source for worker processes, or None to calculate here.
+
+        Workers read the features with OGR, so they are only used for OGR
+        layers in a projected CRS (planar area) without a height raster;
+        other layers are calculated in this process.
+        """
+        if self.workers < 2 or self.height_sampler is not None or self.layer.crs().isGeographic():
+            return None
+        if self.layer.providerType() != 'ogr':
+            return None
+        source = QgsProviderRegistry.instance().decodeUri('ogr', self.layer.source())
+        return source if source.get('path') else None
+
+    def chunk_floors(self, features, floors_index):
+        """Get number of floors for every feature of a chunk.
+
+        With a height sampler the floors are estimated from the raster for
+        the whole chunk at once; features without valid height pixels fall
+        back to the floors attribute or the default.
+        """
+        floors_list = [
+            feature_floors(feature, floors_index, self.default_floors)
+            for feature in features
+        ]
+        if self.height_sampler is None or not features:
+            return floors_list
+        sampled = self.height_sampler.sample_floors([f.geometry() for f in features])
+        return [
+            sampled_floors if sampled_floors is not None else floors
+            for sampled_floors, floors in zip(sampled, floors_list)
+        ]
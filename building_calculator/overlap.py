@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Overlapping footprints for Building Calculator
+
+Finds clusters of overlapping footprints (duplicated digitizing, building
+parts drawn on top of the main outline) and computes the counted share of
+every member's footprint, so that the cluster is counted once. Candidate
+pairs come from a QgsSpatialIndex, so only footprints with intersecting
+bounding boxes are compared.
+"""
+
+from qgis.core import QgsFeatureRequest, QgsGeometry, QgsSpatialIndex
+
+from .layer_processor import create_distance_area, measure_area, feature_floors
+
+
+def group_pairs(pairs):
+    """Group overlapping pairs into clusters (union-find).
+
+    :param pairs: Iterable of (fid, fid) pairs.
+    :returns: List of fid lists; every fid of a pair is in exactly one
+        cluster, together with all fids connected to it.
+    """
+    parent = {}
+
+    def find(fid):
+        root = fid
+        while parent[root] != root:
+            root = parent[root]
+        while parent[fid] != root:
+            parent[fid], fid = root, parent[fid]
+        return root
+
+    for a, b in pairs:
+        parent.setdefault(a, a)
+        parent.setdefault(b, b)
+        root, other_root = find(a), find(b)
+        if root != other_root:
+            parent[other_root] = root
+
+    clusters = {}
+    for fid in parent:
+        clusters.setdefault(find(fid), []).append(fid)
+    return list(clusters.values())
+
+
+class OverlapResolver:
+    """Counted footprint shares for clusters of overlapping buildings."""
+
+    # Overlaps smaller than this share of the smaller footprint are
+    # treated as touching neighbours, not as duplicates
+    MIN_OVERLAP_RATIO = 0.01
+
+    def __init__(self, layer, floors_field=None, default_floors=5,
+                 min_overlap_ratio=MIN_OVERLAP_RATIO, height_sampler=None):
+        """Constructor.
+
+        :param layer: Polygon layer with buildings.
+        :param floors_field: Floors attribute used to rank cluster members.
+        :param height_sampler: Optional HeightRasterSampler; ranks members by
+            the sampled floors, as the layer calculation does.
+        """
+        self.layer = layer
+        self.floors_field = floors_field
+        self.default_floors = default_floors
+        self.height_sampler = height_sampler
+        self.min_overlap_ratio = min_overlap_ratio
+        self.clusters = []
+
+    def find_clusters(self, feedback=None):
+        """Group overlapping footprints into clusters.
+
+        :returns: List of fid lists, only clusters with two or more members.
+        """
+        request = QgsFeatureRequest()
+        request.setNoAttributes()
+        index = QgsSpatialIndex(
+            self.layer.getFeatures(request), feedback, QgsSpatialIndex.FlagStoreFeatureGeometries
+        )
+
+        pairs = []
+        total = max(self.layer.featureCount(), 1)
+        for n, feature in enumerate(self.layer.getFeatures(request)):
+            if feedback is not None and n % 10000 == 0:
+                if feedback.isCanceled():
+                    return []
+                feedback.setProgress(100.0 * n / total)
+
+            geometry = feature.geometry()
+            candidates = [fid for fid in index.intersects(geometry.boundingBox()) if fid > feature.id()]
+            if not candidates:
+                continue
+
+            engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+            engine.prepareGeometry()
+            area = geometry.area()
+            for fid in candidates:
+                other = index.geometry(fid)
+                if not engine.intersects(other.constGet()):
+                    continue
+                overlap = geometry.intersection(other).area()
+                if overlap > self.min_overlap_ratio * min(area, other.area()):
+                    pairs.append((feature.id(), fid))
+
+        self.clusters = group_pairs(pairs)
+        return self.clusters
+
+    def footprint_shares(self, feedback=None):
+        """Counted share of the footprint of every covered cluster member.
+
+        Members are ranked by floors, then by area; each member keeps only
+        the part of its footprint not covered by a higher ranked member. The
+        kept areas of a cluster add up to the area of its union, and
+        overlapping parts are counted with the floors of the tallest member.
+
+        The share is the kept area divided by the member's own area: 0 for a
+        footprint completely covered by a higher ranked member (a duplicate),
+        between 0 and 1 for a partly covered one.
+
+        :returns: Dict of fid to share, see calculator.calculate_share;
+            footprints outside any cluster and members that are not covered
+            are not included.
+        """
+        clusters = self.find_clusters(feedback)
+        if not clusters:
+            return {}
+
+        fields = self.layer.fields()
+        floors_index = fields.indexOf(self.floors_field) if self.floors_field else -1
+        distance_area = create_distance_area(self.layer.crs())
+
+        request = QgsFeatureRequest()
+        request.setFilterFids({fid for members in clusters for fid in members})
+        request.setSubsetOfAttributes([floors_index] if floors_index >= 0 else [])
+        members = {
+            feature.id(): (feature.geometry(), feature_floors(feature, floors_index, self.default_floors))
+            for feature in self.layer.getFeatures(request)
+        }
+        if self.height_sampler is not None and members:
+            fids = list(members)
+            sampled = self.height_sampler.sample_floors([members[fid][0] for fid in fids])
+            for fid, floors in zip(fids, sampled):
+                if floors is not None:
+                    members[fid] = (members[fid][0], floors)
+
+        shares = {}
+        for cluster in clusters:
+            ranked = sorted(
+                (fid for fid in cluster if fid in members),
+                key=lambda fid: (-members[fid][1], -members[fid][0].area(), fid)
+            )
+            covered = None
+            for fid in ranked:
+                geometry = members[fid][0]
+                if covered is not None:
+                    area = measure_area(geometry, distance_area)
+                    own = geometry.difference(covered)
+                    kept = measure_area(own, distance_area) if not own.isEmpty() else 0.0
+                    if area > 0 and kept < area:
+                        shares[fid] = kept / area
+                covered = QgsGeometry(geometry) if covered is None else covered.combine(geometry)
+        return shares
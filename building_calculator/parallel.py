@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Process pool sharding for Building Calculator
+
+Layer-wide runs of file layers (OGR provider) can spread every chunk over
+a pool of worker processes. The main process only sends the feature ids of
+each shard; the workers read the geometries and floors from the source with
+OGR themselves, measure and calculate them, and return the results, so the
+feature reading runs on all cores as well. Workers only import this module,
+``calculator`` and OGR, so they start without Qt or QGIS.
+"""
+
+import multiprocessing
+import multiprocessing.spawn
+import os
+import sys
+
+from . import calculator
+
+
+# OGR layers opened by this worker process, by source
+_layers = {}
+
+
+def _open_layer(source):
+    """Open (once per process) the OGR layer of a decoded QGIS source URI."""
+    key = (source['path'], source.get('layerName'), source.get('layerId'))
+    if key not in _layers:
+        from osgeo import ogr
+        dataset = ogr.Open(source['path'], 0)
+        if dataset is None:
+            raise IOError(f'Cannot open {source["path"]}')
+        if source.get('layerName'):
+            layer = dataset.GetLayerByName(source['layerName'])
+        else:
+            layer = dataset.GetLayer(int(source.get('layerId') or 0))
+        if layer is None:
+            raise IOError(f'Layer not found in {source["path"]}')
+        # The dataset must stay open as long as the layer is used
+        _layers[key] = (dataset, layer)
+    return _layers[key][1]
+
+
+def _floors(value, default_floors):
+    """Number of floors from an attribute value, as feature_floors does."""
+    try:
+        floors = int(value)
+    except (TypeError, ValueError):
+        return default_floors
+    return floors if floors > 0 else default_floors
+
+
+def calculate_shard(shard):
+    """Worker entry point: read and calculate a range of features.
+
+    :param shard: Tuple (source, params, fids, floors_field, default_floors,
+        footprint_shares); ``source`` is the decoded OGR URI of the layer and
+        ``footprint_shares`` maps fids of the shard to the counted share of
+        their footprint.
+    :returns: List of (fid, calculator result) for the features found.
+    """
+    source, params, fids, floors_field, default_floors, footprint_shares = shard
+    layer = _open_layer(source)
+    floors_index = layer.GetLayerDefn().GetFieldIndex(floors_field) if floors_field else -1
+
+    results = []
+    for fid in fids:
+        feature = layer.GetFeature(fid)
+        if feature is None:
+            continue
+        geometry = feature.GetGeometryRef()
+        area = geometry.GetArea() if geometry is not None else 0.0
+        if floors_index >= 0 and feature.IsFieldSetAndNotNull(floors_index):
+            floors = _floors(feature.GetField(floors_index), default_floors)
+        else:
+            floors = default_floors
+        if fid in footprint_shares:
+            results.append((fid, calculator.calculate_share(area, floors, params, footprint_shares[fid])))
+        else:
+            results.append((fid, calculator.calculate(area, floors, params)))
+    return results
+
+
+def python_executable():
+    """Python interpreter for worker processes.
+
+    Inside QGIS ``sys.executable`` is often the QGIS binary itself, which
+    cannot run multiprocessing children.
+    """
+    executable = sys.executable
+    if executable and os.path.basename(executable).lower().startswith('python'):
+        return executable
+    names = ('pythonw.exe', 'python.exe') if os.name == 'nt' else ('python3', 'python')
+    folders = (sys.exec_prefix, os.path.join(sys.exec_prefix, 'bin'), os.path.dirname(executable or ''))
+    for folder in folders:
+        for name in names:
+            candidate = os.path.join(folder, name)
+            if os.path.isfile(candidate):
+                return candidate
+    return executable
+
+
+def default_workers():
+    """Number of CPU cores."""
+    return os.cpu_count() or 1
+
+
+def create_pool(workers):
+    """Create a spawn-based process pool with the given number of workers."""
+    context = multiprocessing.get_context('spawn')
+    # The spawn executable is process-wide; restore it for the rest of QGIS
+    # once the workers are started
+    previous = multiprocessing.spawn.get_executable()
+    context.set_executable(python_executable())
+    try:
+        return context.Pool(workers)
+    finally:
+        context.set_executable(previous)
+
+
+def calculate_chunk(pool, source, params, fids, workers, floors_field=None,
+                    default_floors=5, footprint_shares=None):
+    """Split a chunk of feature ids into contiguous shards, calculate them in
+    the pool and return the (fid, result) pairs merged in the original order."""
+    footprint_shares = footprint_shares or {}
+    size = max(1, -(-len(fids) // workers))
+    shards = []
+    for start in range(0, len(fids), size):
+        shard_fids = [int(fid) for fid in fids[start:start + size]]
+        shares = {fid: footprint_shares[fid] for fid in shard_fids if fid in footprint_shares}
+        shards.append((source, params, shard_fids, floors_field, default_floors, shares))
+    results = []
+    for shard_results in pool.map(calculate_shard, shards):
+        results.extend(shard_results)
+    return results
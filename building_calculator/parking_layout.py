@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Parking Layout Generator for Building Calculator
+
+Lays out perpendicular parking stalls and drive aisles inside a lot polygon.
+The lot is rotated so that its oriented bounding box is axis aligned, then
+swept with double-loaded modules (stall row, aisle, stall row). Every grid
+cell is tested against the prepared lot geometry, so the cost is linear in
+the number of candidate cells.
+"""
+
+import math
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (
+    QgsFeature, QgsField, QgsGeometry, QgsRectangle, QgsVectorLayer
+)
+
+
+class ParkingLayoutGenerator:
+    """Grid/sweep packing of parking stalls into a lot polygon."""
+
+    DEFAULT_STALL_WIDTH = 2.5
+    DEFAULT_STALL_DEPTH = 5.0
+    DEFAULT_AISLE_WIDTH = 6.0
+    PHASE_STEPS = 3
+
+    def __init__(self, stall_width=DEFAULT_STALL_WIDTH, stall_depth=DEFAULT_STALL_DEPTH,
+                 aisle_width=DEFAULT_AISLE_WIDTH):
+        """Constructor.
+
+        :param stall_width: Width of one stall in meters.
+        :param stall_depth: Depth of one stall in meters.
+        :param aisle_width: Width of the drive aisle between stall rows.
+        """
+        self.stall_width = stall_width
+        self.stall_depth = stall_depth
+        self.aisle_width = aisle_width
+
+    @staticmethod
+    def lot_orientation(lot):
+        """Angle in degrees of the lot's oriented minimum bounding box."""
+        box = lot.orientedMinimumBoundingBox()[0]
+        vertices = list(box.vertices())
+        if len(vertices) < 2:
+            return 0.0
+        dx = vertices[1].x() - vertices[0].x()
+        dy = vertices[1].y() - vertices[0].y()
+        return math.degrees(math.atan2(dy, dx))
+
+    def layout(self, lot, required=0):
+        """Lay out stalls and aisles inside the lot.
+
+        Both axes of the lot and a few sweep offsets are tried and the layout
+        with the most stalls wins.
+
+        :param lot: Lot polygon in a projected CRS (meters).
+        :param required: Required number of stalls.
+        :returns: Dict with ``stalls`` and ``aisles`` geometries, ``capacity``,
+            ``required`` and ``fits``.
+        """
+        center = lot.centroid().asPoint()
+        angle = self.lot_orientation(lot)
+        best = None
+
+        for rotation in (angle, angle + 90.0):
+            rotated = QgsGeometry(lot)
+            rotated.rotate(rotation, center)
+            for phase in range(self.PHASE_STEPS):
+                stalls, aisles = self.pack(rotated, phase / self.PHASE_STEPS)
+                if best is None or len(stalls) > len(best[1]):
+                    best = (rotation, stalls, aisles)
+
+        rotation, stalls, aisles = best
+        for geometry in stalls + aisles:
+            geometry.rotate(-rotation, center)
+
+        return {
+            'stalls': stalls,
+            'aisles': aisles,
+            'capacity': len(stalls),
+            'required': required,
+            'fits': len(stalls) >= required,
+        }
+
+    def pack(self, lot, phase=0.0):
+        """Sweep axis-aligned double-loaded modules over the lot.
+
+        :param phase: Offset of the grid as a fraction of the module size.
+        :returns: Tuple of stall and aisle geometry lists.
+        """
+        engine = QgsGeometry.createGeometryEngine(lot.constGet())
+        engine.prepareGeometry()
+
+        def inside(xmin, ymin, xmax, ymax):
+            cell = QgsGeometry.fromRect(QgsRectangle(xmin, ymin, xmax, ymax))
+            return engine.contains(cell.constGet())
+
+        w, d, a = self.stall_width, self.stall_depth, self.aisle_width
+        box = lot.boundingBox()
+        x_start = box.xMinimum() + phase * w
+        columns = int((box.xMaximum() - x_start) // w)
+
+        stalls = []
+        aisles = []
+        y = box.yMinimum() + phase * (2 * d + a)
+        while y + d + a <= box.yMaximum():
+            aisle_bottom = y + d
+            aisle_top = aisle_bottom + a
+            run_start = None
+
+            for column in range(columns + 1):
+                x = x_start + column * w
+                used = False
+                if column < columns and inside(x, aisle_bottom, x + w, aisle_top):
+                    # Stall rows on both sides of the aisle
+                    if inside(x, y, x + w, aisle_bottom):
+                        stalls.append(QgsGeometry.fromRect(QgsRectangle(x, y, x + w, aisle_bottom)))
+                        used = True
+                    if inside(x, aisle_top, x + w, aisle_top + d):
+                        stalls.append(QgsGeometry.fromRect(QgsRectangle(x, aisle_top, x + w, aisle_top + d)))
+                        used = True
+
+                # Merge consecutive used aisle cells into one aisle rectangle
+                if used and run_start is None:
+                    run_start = x
+                elif not used and run_start is not None:
+                    aisles.append(QgsGeometry.fromRect(QgsRectangle(run_start, aisle_bottom, x, aisle_top)))
+                    run_start = None
+
+            y += 2 * d + a
+        return stalls, aisles
+
+
+def create_layout_layers(result, crs):
+    """Create memory layers with the stalls and aisles of a layout."""
+    layers = []
+    for name, geometries in (('Парковочные места', result['stalls']), ('Проезды', result['aisles'])):
+        layer = QgsVectorLayer('Polygon', name, 'memory')
+        layer.setCrs(crs)
+        provider = layer.dataProvider()
+        provider.addAttributes([QgsField('id', QVariant.Int)])
+        layer.updateFields()
+
+        features = []
+        for index, geometry in enumerate(geometries):
+            feature = QgsFeature(layer.fields())
+            feature.setGeometry(geometry)
+            feature.setAttributes([index + 1])
+            features.append(feature)
+        provider.addFeatures(features)
+        layer.updateExtents()
+        layers.append(layer)
+    return layers
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Phasing Dialog for Building Calculator
+"""
+
+import math
+from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
+    QLabel, QSpinBox, QPushButton, QGroupBox, QComboBox, QSlider,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+
+from . import calculator
+from .phasing import PhasingTimeline
+
+
+class PhasingDialog(QDialog):
+    """Dialog showing cumulative totals over construction phases."""
+
+    def __init__(self, parent=None, layer=None, settings=None):
+        """Constructor.
+
+        :param layer: Polygon layer with a build year or phase attribute.
+        """
+        super().__init__(parent)
+        self.layer = layer
+        self.settings = settings
+        self.timeline = None
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Set up the user interface."""
+        self.setWindowTitle('Building Calculator - Очерёдность строительства')
+        self.setMinimumWidth(550)
+        self.setMinimumHeight(550)
+
+        layout = QVBoxLayout()
+
+        # Source fields
+        source_group = QGroupBox('Здания')
+        source_layout = QFormLayout()
+
+        self.combo_phase_field = QComboBox()
+        self.combo_floors_field = QComboBox()
+        self.combo_floors_field.addItem('— Не использовать —', None)
+        for field in self.layer.fields():
+            if field.isNumeric():
+                self.combo_phase_field.addItem(field.name(), field.name())
+                self.combo_floors_field.addItem(field.name(), field.name())
+        source_layout.addRow('Год / очередь:', self.combo_phase_field)
+        source_layout.addRow('Поле этажности:', self.combo_floors_field)
+
+        self.spin_floors = QSpinBox()
+        self.spin_floors.setRange(1, 200)
+        self.spin_floors.setValue(5)
+        source_layout.addRow('Этажей по умолчанию:', self.spin_floors)
+
+        self.btn_build = QPushButton('Рассчитать')
+        self.btn_build.clicked.connect(self.build_timeline)
+        source_layout.addRow(self.btn_build)
+
+        source_group.setLayout(source_layout)
+        layout.addWidget(source_group)
+
+        # Timeline
+        timeline_group = QGroupBox('Нарастающий итог')
+        timeline_layout = QFormLayout()
+
+        self.slider_phase = QSlider(Qt.Horizontal)
+        self.slider_phase.setEnabled(False)
+        self.slider_phase.valueChanged.connect(self.update_totals)
+        self.label_phase = QLabel('-')
+        self.label_phase.setStyleSheet('font-weight: bold;')
+        timeline_layout.addRow(self.label_phase, self.slider_phase)
+
+        self.label_buildings = QLabel('-')
+        timeline_layout.addRow('Зданий:', self.label_buildings)
+
+        self.label_apartments = QLabel('-')
+        self.label_apartments.setStyleSheet('font-weight: bold;')
+        timeline_layout.addRow('Квартир:', self.label_apartments)
+
+        self.label_residents = QLabel('-')
+        self.label_residents.setStyleSheet('font-weight: bold; font-size: 16px; color: #2e7d32;')
+        timeline_layout.addRow('👥 Жителей:', self.label_residents)
+
+        self.label_parking = QLabel('-')
+        self.label_parking.setStyleSheet('font-weight: bold; font-size: 16px; color: #1565c0;')
+        timeline_layout.addRow('🚗 Парковочных мест:', self.label_parking)
+
+        timeline_group.setLayout(timeline_layout)
+        layout.addWidget(timeline_group)
+
+        # Per-phase table
+        self.table = QTableWidget()
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(['Очередь', 'Зданий', 'Квартир', 'Жителей', 'Парковка'])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        # Close button
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+
+        self.btn_close = QPushButton('Закрыть')
+        self.btn_close.clicked.connect(self.accept)
+        buttons_layout.addWidget(self.btn_close)
+
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def build_timeline(self):
+        """Calculate the layer and fill the timeline."""
+        phase_field = self.combo_phase_field.currentData()
+        if phase_field is None:
+            QMessageBox.warning(self, 'Ошибка', 'В слое нет числового поля с годом или очередью.')
+            return
+
+        self.timeline = PhasingTimeline.from_layer(
+            self.layer,
+            phase_field,
+            calculator.params_from_settings(self.settings),
+            floors_field=self.combo_floors_field.currentData(),
+            default_floors=self.spin_floors.value()
+        )
+        if not len(self.timeline.phases):
+            QMessageBox.warning(self, 'Ошибка', 'Ни у одного здания не указан год или очередь.')
+            return
+
+        # Table: cumulative totals per phase, increment in brackets
+        rows = self.timeline.table()
+        self.table.setRowCount(len(rows))
+        for row, (phase, increments, cumulative) in enumerate(rows):
+            self.table.setItem(row, 0, QTableWidgetItem(f'{phase:g}'))
+            for column, key in enumerate(PhasingTimeline.COLUMNS, start=1):
+                self.table.setItem(row, column, QTableWidgetItem(
+                    f'{int(cumulative[key]):,} (+{int(increments[key]):,})'
+                ))
+
+        self.slider_phase.blockSignals(True)
+        self.slider_phase.setRange(
+            int(math.floor(self.timeline.phases[0])), int(math.ceil(self.timeline.phases[-1]))
+        )
+        self.slider_phase.setValue(self.slider_phase.maximum())
+        self.slider_phase.blockSignals(False)
+        self.slider_phase.setEnabled(True)
+        self.update_totals(self.slider_phase.value())
+
+        if self.timeline.unphased:
+            QMessageBox.information(
+                self, 'Очерёдность',
+                f'Зданий без года / очереди: {self.timeline.unphased:,} — не учтены.'
+            )
+
+    def update_totals(self, value):
+        """Show cumulative totals for the slider position."""
+        if self.timeline is None:
+            return
+        totals = self.timeline.totals_at(value)
+        self.label_phase.setText(f'{value}')
+        self.label_buildings.setText(f'{int(totals["buildings"]):,}')
+        self.label_apartments.setText(f'{int(totals["apartments"]):,}')
+        self.label_residents.setText(f'{int(totals["residents"]):,} человек')
+        self.label_parking.setText(f'{int(totals["parking"]):,} мест')
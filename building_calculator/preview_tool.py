@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Live Preview Map Tool for Building Calculator
+
+Shows apartments, residents and parking next to the cursor while a building
+footprint is drawn. The area is kept as a running shoelace sum over the
+placed vertices, so a mouse move only adds the two edges to the cursor
+instead of re-measuring the whole ring.
+"""
+
+from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtGui import QColor
+from qgis.PyQt.QtWidgets import QToolTip
+from qgis.core import QgsDistanceArea, QgsProject, QgsUnitTypes, QgsWkbTypes, QgsPointXY
+from qgis.gui import QgsMapTool, QgsRubberBand
+
+from . import calculator
+from .calculation_dialog import CalculationDialog
+
+
+class IncrementalArea:
+    """Polygon area updated vertex by vertex (shoelace formula).
+
+    Coordinates are stored relative to the first vertex to avoid loss of
+    precision with large projected coordinates.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self.points = []
+        self.terms = []
+        self.total = 0.0
+
+    @staticmethod
+    def cross(a, b):
+        """Shoelace term of the edge a -> b."""
+        return a[0] * b[1] - b[0] * a[1]
+
+    def relative(self, x, y):
+        """Point relative to the first vertex."""
+        if not self.points:
+            return (0.0, 0.0)
+        return (x - self.origin[0], y - self.origin[1])
+
+    def add(self, x, y):
+        """Add a vertex."""
+        if not self.points:
+            self.origin = (x, y)
+        point = self.relative(x, y)
+        if self.points:
+            term = self.cross(self.points[-1], point)
+            self.terms.append(term)
+            self.total += term
+        self.points.append(point)
+
+    def pop(self):
+        """Remove the last vertex."""
+        if not self.points:
+            return
+        self.points.pop()
+        if self.terms:
+            self.total -= self.terms.pop()
+
+    def area(self, x=None, y=None):
+        """Area of the closed ring, optionally with a trailing cursor vertex."""
+        if not self.points:
+            return 0.0
+        total = self.total
+        last = self.points[-1]
+        if x is not None:
+            cursor = self.relative(x, y)
+            total += self.cross(last, cursor)
+            last = cursor
+        # Closing edge back to the first vertex (the origin) adds nothing
+        return abs(total) / 2.0
+
+
+class PreviewMapTool(QgsMapTool):
+    """Map tool drawing a footprint with a live calculation preview.
+
+    Left click adds a vertex, Backspace removes the last one, +/- change the
+    number of floors and right click finishes the polygon and opens the
+    calculation dialog.
+    """
+
+    def __init__(self, canvas, settings):
+        """Constructor."""
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.settings = settings
+        self.floors = 5
+        self.rubber_band = None
+        self.area = IncrementalArea()
+        self.map_points = []
+        self.setCursor(Qt.CrossCursor)
+
+    def activate(self):
+        """Prepare parameters and units when the tool is selected."""
+        super().activate()
+        self.params = calculator.params_from_settings(self.settings)
+        crs = self.canvas.mapSettings().destinationCrs()
+
+        # Geographic CRS: fall back to ellipsoidal measurement of the ring
+        self.distance_area = None
+        self.unit_factor = 1.0
+        if crs.isGeographic():
+            self.distance_area = QgsDistanceArea()
+            self.distance_area.setSourceCrs(crs, QgsProject.instance().transformContext())
+            self.distance_area.setEllipsoid(QgsProject.instance().ellipsoid())
+        else:
+            self.unit_factor = QgsUnitTypes.fromUnitToUnitFactor(
+                QgsUnitTypes.distanceToAreaUnit(crs.mapUnits()), QgsUnitTypes.AreaSquareMeters
+            )
+        self.reset()
+
+    def deactivate(self):
+        """Clean up when another tool is selected."""
+        self.reset()
+        super().deactivate()
+
+    def reset(self):
+        """Discard the polygon being drawn."""
+        self.area = IncrementalArea()
+        self.map_points = []
+        if self.rubber_band is not None:
+            self.canvas.scene().removeItem(self.rubber_band)
+        self.rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.PolygonGeometry)
+        self.rubber_band.setColor(QColor(46, 125, 50, 160))
+        self.rubber_band.setFillColor(QColor(46, 125, 50, 60))
+        self.rubber_band.setWidth(2)
+        QToolTip.hideText()
+
+    def current_area(self, point=None):
+        """Footprint area in m², optionally with the cursor as last vertex."""
+        if self.distance_area is not None:
+            points = self.map_points + ([point] if point is not None else [])
+            if len(points) < 3:
+                return 0.0
+            return self.distance_area.measurePolygon(points)
+        if point is None:
+            return self.area.area() * self.unit_factor
+        return self.area.area(point.x(), point.y()) * self.unit_factor
+
+    def show_preview(self, event, point=None):
+        """Show the calculation for the current polygon next to the cursor."""
+        area = self.current_area(point)
+        result = calculator.calculate(area, self.floors, self.params)
+        if result['exceeded']:
+            parking = '-'
+        else:
+            parking = f'{result["parking"]:,}'
+        QToolTip.showText(
+            self.canvas.mapToGlobal(event.pos()),
+            f'Площадь: {area:,.1f} м² × {self.floors} эт.\n'
+            f'Квартир: {result["apartments"]:,}\n'
+            f'Жителей: {int(result["residents"]):,}\n'
+            f'Парковок: {parking}',
+            self.canvas
+        )
+
+    def canvasMoveEvent(self, event):
+        """Update rubber band and preview for the cursor position."""
+        if not self.map_points:
+            return
+        point = self.toMapCoordinates(event.pos())
+        self.rubber_band.movePoint(point)
+        self.show_preview(event, point)
+
+    def canvasPressEvent(self, event):
+        """Add a vertex or finish the polygon."""
+        point = self.toMapCoordinates(event.pos())
+        if event.button() == Qt.RightButton:
+            self.finish()
+            return
+
+        if not self.map_points:
+            self.rubber_band.addPoint(point)
+        self.map_points.append(QgsPointXY(point))
+        self.area.add(point.x(), point.y())
+        # Last rubber band point follows the cursor
+        self.rubber_band.addPoint(point)
+        self.show_preview(event)
+
+    def keyPressEvent(self, event):
+        """Handle Backspace, Escape and floor changes."""
+        if event.key() == Qt.Key_Backspace and self.map_points:
+            self.map_points.pop()
+            self.area.pop()
+            self.rubber_band.removeLastPoint()
+            if not self.map_points:
+                self.reset()
+        elif event.key() == Qt.Key_Escape:
+            self.reset()
+        elif event.key() in (Qt.Key_Plus, Qt.Key_Equal):
+            self.floors = min(self.floors + 1, 200)
+        elif event.key() == Qt.Key_Minus:
+            self.floors = max(self.floors - 1, 1)
+        else:
+            return
+        event.accept()
+
+    def finish(self):
+        """Open the calculation dialog for the drawn footprint."""
+        if len(self.map_points) < 3:
+            self.reset()
+            return
+        area = self.current_area()
+        self.reset()
+        dialog = CalculationDialog(self.canvas.window(), area, self.settings)
+        dialog.spin_floors.setValue(self.floors)
+        dialog.exec_()
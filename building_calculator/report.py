@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Report generation for Building Calculator
+
+Writes an HTML or PDF report with one page per building (apartment type
+breakdown, unused area, parking) and a summary page. Buildings are rendered
+in chunks and written out as they are produced, so memory use does not
+grow with the size of the layer. Templates are ``string.Template`` texts
+compiled once and reused for every building.
+"""
+
+import functools
+import html
+import os
+import string
+from qgis.PyQt.QtCore import QMarginsF, QRectF, QSizeF
+from qgis.PyQt.QtGui import QPageLayout, QPageSize, QPainter, QPdfWriter, QTextDocument
+from qgis.core import QgsFeatureRequest
+
+from . import calculator
+from .layer_processor import create_distance_area, measure_area, feature_floors
+
+
+STYLE = '''
+body { font-family: sans-serif; font-size: 10pt; }
+h1 { font-size: 16pt; }
+h2 { font-size: 13pt; color: #2e7d32; }
+table { border-collapse: collapse; }
+td, th { border: 1px solid #bbb; padding: 3px 6px; text-align: right; }
+th { background: #eee; }
+.warning { color: #d32f2f; font-weight: bold; }
+.note { font-style: italic; color: #888; }
+'''
+
+HEADER_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>$title</title><style>$style</style></head><body>
+'''
+
+FOOTER_TEMPLATE = '''</body></html>
+'''
+
+TITLE_TEMPLATE = '''<h1>$title</h1>
+<p>Зданий в слое: $buildings</p>
+'''
+
+BUILDING_TEMPLATE = '''<div style="page-break-before: always;">
+<h2>$name</h2>
+<table>
+<tr><th>Площадь застройки</th><td>$footprint м²</td></tr>
+<tr><th>Количество этажей</th><td>$floors</td></tr>
+<tr><th>Общая площадь</th><td>$total_area м²</td></tr>
+<tr><th>Квартир</th><td>$apartments</td></tr>
+<tr><th>Жителей</th><td>$residents</td></tr>
+<tr><th>Парковочных мест</th><td>$parking</td></tr>
+<tr><th>Площадь парковки</th><td>$parking_area</td></tr>
+</table>
+$types
+</div>
+'''
+
+TYPES_TEMPLATE = '''<p class="$area_class">$area_note</p>
+<table>
+<tr><th>Тип</th><th>Площадь (м²)</th><th>Кол-во</th><th>Жителей</th><th>Площадь квартир (м²)</th></tr>
+$rows
+</table>
+'''
+
+TYPE_ROW_TEMPLATE = '''<tr><td>$name</td><td>$size</td><td>$count</td><td>$residents</td><td>$area</td></tr>
+'''
+
+SUMMARY_TEMPLATE = '''<div style="page-break-before: always;">
+<h1>$title — итого</h1>
+<table>
+<tr><th>Зданий</th><td>$buildings</td></tr>
+<tr><th>Общая площадь</th><td>$total_area м²</td></tr>
+<tr><th>Квартир</th><td>$apartments</td></tr>
+<tr><th>Жителей</th><td>$residents</td></tr>
+<tr><th>Парковочных мест</th><td>$parking</td></tr>
+<tr><th>Площадь парковки</th><td>$parking_area м²</td></tr>
+<tr><th>Превышение площади</th><td>$exceeded</td></tr>
+</table>
+</div>
+'''
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(text):
+    """Compile a template text once; later calls return the cached template."""
+    return string.Template(text)
+
+
+def render(text, **values):
+    """Render a template text with the given values."""
+    return compile_template(text).safe_substitute(**values)
+
+
+class ReportGenerator:
+    """Streamed per-building report for a layer."""
+
+    CHUNK_SIZE = 500
+
+    def __init__(self, layer, params, floors_field=None, default_floors=5,
+                 name_field=None, building_template=BUILDING_TEMPLATE):
+        """Constructor.
+
+        :param layer: Polygon layer with buildings.
+        :param params: Calculation parameters, see calculator.params_from_settings.
+        :param name_field: Attribute used as the building title.
+        :param building_template: Template text of one building page.
+        """
+        self.layer = layer
+        self.params = params
+        self.floors_field = floors_field
+        self.default_floors = default_floors
+        self.name_field = name_field
+        self.building_template = building_template
+        self.title = html.escape(layer.name())
+        self.type_rows = self.render_type_rows()
+
+    def render_type_rows(self):
+        """Rows of the apartment type table, the same for every building."""
+        if not self.params['use_types']:
+            return ''
+        return ''.join(
+            render(
+                TYPE_ROW_TEMPLATE,
+                name=html.escape(str(apt.get("name", ""))),
+                size=f'{apt.get("size", 50):,}',
+                count=f'{apt.get("count", 1):,}',
+                residents=f'{apt.get("count", 1) * apt.get("residents", 2.0):,.1f}',
+                area=f'{apt.get("count", 1) * apt.get("size", 50):,}',
+            )
+            for apt in self.params['apt_types']
+        )
+
+    def render_types(self, result):
+        """Apartment type breakdown of a building."""
+        if not self.params['use_types']:
+            return ''
+        if result['exceeded']:
+            area_class = 'warning'
+            area_note = f'⚠️ Превышение на {int(result["used_area"] - result["total_area"]):,} м²'
+        else:
+            area_class = 'note'
+            area_note = f'Использовано: {int(result["used_area"]):,} м² | Свободно: {int(result["unused_area"]):,} м²'
+        return render(TYPES_TEMPLATE, area_class=area_class, area_note=area_note, rows=self.type_rows)
+
+    def render_building(self, name, footprint, floors, result):
+        """HTML of one building page."""
+        exceeded = result['exceeded']
+        return render(
+            self.building_template,
+            name=html.escape(str(name)),
+            footprint=f'{footprint:,.1f}',
+            floors=floors,
+            total_area=f'{result["total_area"]:,.1f}',
+            apartments=f'{result["apartments"]:,}',
+            residents=f'{int(result["residents"]):,}',
+            parking='-' if exceeded else f'{result["parking"]:,}',
+            parking_area='-' if exceeded else f'{int(result["parking_area"]):,} м²',
+            types=self.render_types(result),
+        )
+
+    def pages(self, feedback=None):
+        """Generate the report body in chunks of HTML.
+
+        Yields the title, one chunk per CHUNK_SIZE buildings and finally
+        the summary.
+        """
+        fields = self.layer.fields()
+        floors_index = fields.indexOf(self.floors_field) if self.floors_field else -1
+        name_index = fields.indexOf(self.name_field) if self.name_field else -1
+        distance_area = create_distance_area(self.layer.crs())
+
+        request = QgsFeatureRequest()
+        request.setSubsetOfAttributes([i for i in (floors_index, name_index) if i >= 0])
+
+        totals = {
+            'buildings': 0, 'total_area': 0.0, 'apartments': 0, 'residents': 0.0,
+            'parking': 0, 'parking_area': 0.0, 'exceeded': 0,
+        }
+        total = max(self.layer.featureCount(), 1)
+        yield render(TITLE_TEMPLATE, title=self.title, buildings=f'{self.layer.featureCount():,}')
+
+        chunk = []
+        for feature in self.layer.getFeatures(request):
+            footprint = measure_area(feature.geometry(), distance_area)
+            floors = feature_floors(feature, floors_index, self.default_floors)
+            result = calculator.calculate(footprint, floors, self.params)
+            name = feature.attributes()[name_index] if name_index >= 0 else None
+            chunk.append(self.render_building(
+                name if name not in (None, '') else f'Здание {feature.id()}', footprint, floors, result
+            ))
+
+            totals['buildings'] += 1
+            totals['total_area'] += result['total_area']
+            totals['apartments'] += result['apartments']
+            totals['residents'] += result['residents']
+            totals['parking'] += result['parking'] or 0
+            totals['parking_area'] += result['parking_area'] or 0
+            totals['exceeded'] += bool(result['exceeded'])
+
+            if len(chunk) >= self.CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+                if feedback is not None:
+                    if feedback.isCanceled():
+                        return
+                    feedback.setProgress(100.0 * totals['buildings'] / total)
+        if chunk:
+            yield ''.join(chunk)
+
+        yield render(
+            SUMMARY_TEMPLATE,
+            title=self.title,
+            buildings=f'{totals["buildings"]:,}',
+            total_area=f'{totals["total_area"]:,.1f}',
+            apartments=f'{totals["apartments"]:,}',
+            residents=f'{int(totals["residents"]):,}',
+            parking=f'{totals["parking"]:,}',
+            parking_area=f'{int(totals["parking_area"]):,}',
+            exceeded=f'{totals["exceeded"]:,}',
+        )
+
+    def write(self, path, feedback=None):
+        """Write the report as PDF (``.pdf``) or HTML.
+
+        The report is written to a ``.part`` file next to ``path`` and
+        renamed once complete, so a cancelled or failed run leaves no
+        truncated report behind.
+
+        :returns: True if the report was written, False if cancelled.
+        """
+        part_path = f'{path}.part'
+        try:
+            if path.lower().endswith('.pdf'):
+                self.write_pdf(part_path, feedback)
+            else:
+                self.write_html(part_path, feedback)
+            finished = feedback is None or not feedback.isCanceled()
+            if finished:
+                os.replace(part_path, path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        return finished
+
+    def write_html(self, path, feedback=None):
+        """Write the report as one HTML file, chunk by chunk."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render(HEADER_TEMPLATE, title=self.title, style=STYLE))
+            for page in self.pages(feedback):
+                f.write(page)
+            f.write(render(FOOTER_TEMPLATE))
+
+    def write_pdf(self, path, feedback=None):
+        """Write the report as PDF.
+
+        Every chunk is laid out in its own QTextDocument and painted page by
+        page, so only one chunk is held in memory at a time.
+        """
+        writer = QPdfWriter(path)
+        writer.setResolution(96)
+        writer.setPageSize(QPageSize(QPageSize.A4))
+        writer.setPageMargins(QMarginsF(15, 15, 15, 15), QPageLayout.Millimeter)
+        painter = QPainter(writer)
+        page_size = QSizeF(writer.width(), writer.height())
+
+        first_page = True
+        for page in self.pages(feedback):
+            document = QTextDocument()
+            document.setHtml(render(HEADER_TEMPLATE, title=self.title, style=STYLE) + page + FOOTER_TEMPLATE)
+            document.setPageSize(page_size)
+            for number in range(document.pageCount()):
+                if not first_page:
+                    writer.newPage()
+                first_page = False
+                painter.save()
+                painter.translate(0, -number * page_size.height())
+                document.drawContents(painter, QRectF(0, number * page_size.height(),
+                                                      page_size.width(), page_size.height()))
+                painter.restore()
+        painter.end()
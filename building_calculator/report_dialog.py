@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Report Dialog for Building Calculator
+"""
+
+from qgis.PyQt.QtCore import Qt, QCoreApplication, QUrl
+from qgis.PyQt.QtGui import QDesktopServices
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
+    QSpinBox, QPushButton, QGroupBox, QComboBox,
+    QProgressDialog, QMessageBox
+)
+from qgis.core import QgsFeedback
+from qgis.gui import QgsFileWidget
+
+from . import calculator
+from .report import ReportGenerator, BUILDING_TEMPLATE
+
+
+class ReportDialog(QDialog):
+    """Dialog for exporting a per-building HTML or PDF report."""
+
+    def __init__(self, parent=None, layer=None, settings=None):
+        """Constructor.
+
+        :param layer: Polygon layer with buildings.
+        """
+        super().__init__(parent)
+        self.layer = layer
+        self.settings = settings
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Set up the user interface."""
+        self.setWindowTitle('Building Calculator - Отчёт')
+        self.setMinimumWidth(450)
+
+        layout = QVBoxLayout()
+
+        # Buildings
+        buildings_group = QGroupBox('Здания')
+        buildings_layout = QFormLayout()
+
+        self.combo_name_field = QComboBox()
+        self.combo_name_field.addItem('— Номер объекта —', None)
+        self.combo_floors_field = QComboBox()
+        self.combo_floors_field.addItem('— Не использовать —', None)
+        for field in self.layer.fields():
+            self.combo_name_field.addItem(field.name(), field.name())
+            if field.isNumeric():
+                self.combo_floors_field.addItem(field.name(), field.name())
+        buildings_layout.addRow('Название:', self.combo_name_field)
+        buildings_layout.addRow('Поле этажности:', self.combo_floors_field)
+
+        self.spin_floors = QSpinBox()
+        self.spin_floors.setRange(1, 200)
+        self.spin_floors.setValue(5)
+        buildings_layout.addRow('Этажей по умолчанию:', self.spin_floors)
+
+        buildings_group.setLayout(buildings_layout)
+        layout.addWidget(buildings_group)
+
+        # Output
+        output_group = QGroupBox('Отчёт')
+        output_layout = QFormLayout()
+
+        self.file_template = QgsFileWidget()
+        self.file_template.setFilter('HTML (*.html *.htm)')
+        self.file_template.lineEdit().setPlaceholderText('[Стандартный шаблон]')
+        self.file_template.setToolTip(
+            'Шаблон страницы здания: $name, $footprint, $floors, $total_area, '
+            '$apartments, $residents, $parking, $parking_area, $types'
+        )
+        output_layout.addRow('Шаблон здания:', self.file_template)
+
+        self.file_output = QgsFileWidget()
+        self.file_output.setStorageMode(QgsFileWidget.SaveFile)
+        self.file_output.setFilter('HTML (*.html);;PDF (*.pdf)')
+        output_layout.addRow('Файл:', self.file_output)
+
+        output_group.setLayout(output_layout)
+        layout.addWidget(output_group)
+
+        # Buttons
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+
+        self.btn_close = QPushButton('Закрыть')
+        self.btn_close.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.btn_close)
+
+        self.btn_run = QPushButton('Создать')
+        self.btn_run.clicked.connect(self.run)
+        self.btn_run.setDefault(True)
+        buttons_layout.addWidget(self.btn_run)
+
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def run(self):
+        """Write the report and open it."""
+        path = self.file_output.filePath()
+        if not path:
+            QMessageBox.warning(self, 'Ошибка', 'Укажите файл отчёта.')
+            return
+
+        template = BUILDING_TEMPLATE
+        if self.file_template.filePath():
+            try:
+                with open(self.file_template.filePath(), encoding='utf-8') as f:
+                    template = f.read()
+            except OSError as e:
+                QMessageBox.warning(self, 'Ошибка', f'Не удалось прочитать шаблон: {e}')
+                return
+
+        generator = ReportGenerator(
+            self.layer,
+            calculator.params_from_settings(self.settings),
+            floors_field=self.combo_floors_field.currentData(),
+            default_floors=self.spin_floors.value(),
+            name_field=self.combo_name_field.currentData(),
+            building_template=template
+        )
+
+        progress = QProgressDialog('Создание отчёта...', 'Отмена', 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        feedback = QgsFeedback()
+        progress.canceled.connect(feedback.cancel)
+
+        def on_progress(value):
+            progress.setValue(int(value))
+            QCoreApplication.processEvents()
+
+        feedback.progressChanged.connect(on_progress)
+
+        try:
+            written = generator.write(path, feedback)
+        except OSError as e:
+            progress.close()
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось записать отчёт: {e}')
+            return
+        progress.close()
+        if not written:
+            return
+
+        QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+        self.accept()
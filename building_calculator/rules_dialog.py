@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Normative Rules Dialog for Building Calculator
+"""
+
+import json
+from qgis.PyQt.QtGui import QFontDatabase
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
+    QLabel, QSpinBox, QPushButton, QGroupBox, QComboBox, QPlainTextEdit,
+    QFileDialog, QMessageBox
+)
+
+from . import calculator
+from .rules_engine import RuleSet, DEFAULT_RULES, VARIABLES, FUNCTIONS, evaluate_layer
+from .settings_dialog import SettingsDialog
+
+
+class RulesDialog(QDialog):
+    """Dialog for editing JSON norms and evaluating them over a layer."""
+
+    def __init__(self, parent=None, layer=None, settings=None):
+        """Constructor.
+
+        :param layer: Polygon layer with buildings.
+        """
+        super().__init__(parent)
+        self.layer = layer
+        self.settings = settings
+        self.setup_ui()
+        self.load_rules()
+
+    def setup_ui(self):
+        """Set up the user interface."""
+        self.setWindowTitle('Building Calculator - Нормативы')
+        self.setMinimumWidth(600)
+        self.setMinimumHeight(500)
+
+        layout = QVBoxLayout()
+
+        # Rules editor
+        rules_group = QGroupBox('Нормативы (JSON)')
+        rules_layout = QVBoxLayout()
+
+        self.edit_rules = QPlainTextEdit()
+        self.edit_rules.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        rules_layout.addWidget(self.edit_rules)
+
+        hint = QLabel(
+            f'Переменные: {", ".join(VARIABLES)}<br>'
+            f'Функции: {", ".join(FUNCTIONS)}'
+        )
+        hint.setStyleSheet('font-style: italic; color: #888;')
+        rules_layout.addWidget(hint)
+
+        rules_buttons = QHBoxLayout()
+        self.btn_load = QPushButton('Загрузить…')
+        self.btn_load.clicked.connect(self.load_file)
+        rules_buttons.addWidget(self.btn_load)
+        self.btn_check = QPushButton('Проверить')
+        self.btn_check.clicked.connect(self.check_rules)
+        rules_buttons.addWidget(self.btn_check)
+        self.btn_default = QPushButton('Пример')
+        self.btn_default.clicked.connect(self.reset_to_defaults)
+        rules_buttons.addWidget(self.btn_default)
+        rules_buttons.addStretch()
+        rules_layout.addLayout(rules_buttons)
+
+        rules_group.setLayout(rules_layout)
+        layout.addWidget(rules_group)
+
+        # Buildings
+        buildings_group = QGroupBox('Здания')
+        buildings_layout = QFormLayout()
+
+        self.combo_floors_field = QComboBox()
+        self.combo_floors_field.addItem('— Не использовать —', None)
+        for field in self.layer.fields():
+            if field.isNumeric():
+                self.combo_floors_field.addItem(field.name(), field.name())
+        buildings_layout.addRow('Поле этажности:', self.combo_floors_field)
+
+        self.spin_floors = QSpinBox()
+        self.spin_floors.setRange(1, 200)
+        self.spin_floors.setValue(5)
+        buildings_layout.addRow('Этажей по умолчанию:', self.spin_floors)
+
+        buildings_group.setLayout(buildings_layout)
+        layout.addWidget(buildings_group)
+
+        # Buttons
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+
+        self.btn_close = QPushButton('Закрыть')
+        self.btn_close.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.btn_close)
+
+        self.btn_run = QPushButton('Рассчитать слой')
+        self.btn_run.clicked.connect(self.run)
+        self.btn_run.setDefault(True)
+        buttons_layout.addWidget(self.btn_run)
+
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+    def load_rules(self):
+        """Load rules JSON from QSettings."""
+        rules_json = self.settings.value(SettingsDialog.KEY_NORM_RULES, None)
+        if rules_json:
+            self.edit_rules.setPlainText(rules_json)
+        else:
+            self.reset_to_defaults()
+
+    def reset_to_defaults(self):
+        """Show the example rules."""
+        self.edit_rules.setPlainText(json.dumps(DEFAULT_RULES, ensure_ascii=False, indent=4))
+
+    def load_file(self):
+        """Load rules from a JSON file."""
+        path, _ = QFileDialog.getOpenFileName(self, 'Нормативы', '', 'JSON (*.json)')
+        if not path:
+            return
+        with open(path, encoding='utf-8') as f:
+            self.edit_rules.setPlainText(f.read())
+
+    def compile_rules(self):
+        """Compile the rules, showing an error message if they are invalid."""
+        try:
+            return RuleSet.from_json(self.edit_rules.toPlainText())
+        except ValueError as e:
+            QMessageBox.warning(self, 'Ошибка в нормативах', str(e))
+            return None
+
+    def check_rules(self):
+        """Check the rules and list the output fields."""
+        ruleset = self.compile_rules()
+        if ruleset is None:
+            return
+        QMessageBox.information(self, 'Нормативы', '\n'.join(
+            f'{rule["title"]} → {rule["field"]}' for rule in ruleset.rules
+        ))
+
+    def run(self):
+        """Evaluate the rules for all buildings of the layer."""
+        if self.layer.isEditable():
+            QMessageBox.warning(self, 'Ошибка', 'Завершите редактирование слоя перед расчётом.')
+            return
+
+        ruleset = self.compile_rules()
+        if ruleset is None:
+            return
+        self.settings.setValue(SettingsDialog.KEY_NORM_RULES, self.edit_rules.toPlainText())
+
+        try:
+            totals = evaluate_layer(
+                self.layer,
+                ruleset,
+                calculator.params_from_settings(self.settings),
+                floors_field=self.combo_floors_field.currentData(),
+                default_floors=self.spin_floors.value()
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, 'Ошибка в нормативах', str(e))
+            return
+        QMessageBox.information(self, 'Готово', '\n'.join(
+            f'{rule["title"]}: {totals[rule["name"]]:,.0f}' for rule in ruleset.rules
+        ))
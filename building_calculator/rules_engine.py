@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Normative rules engine for Building Calculator
+
+Norms (parking, kindergarten and school places, green area, ...) are
+defined in JSON as arithmetic expressions over the building variables.
+Each expression is parsed and checked once, compiled to Python bytecode
+working on numpy arrays and then evaluated for all buildings of a layer in
+a single call, e.g.::
+
+    {
+        "name": "Example norms",
+        "rules": [
+            {"name": "parking", "expr": "residents / 1000 * 350", "round": "floor"},
+            {"name": "kindergarten", "expr": "residents / 1000 * 60", "round": "ceil"}
+        ]
+    }
+
+Rules are evaluated in order and may use the results of earlier rules. A
+rule named like a base variable (e.g. ``residents``) replaces it for the
+following rules.
+"""
+
+import ast
+import json
+import numpy as np
+
+from .calculator import calculate_arrays
+
+
+# Variables available to every rule
+VARIABLES = ('footprint', 'floors', 'total_area', 'apartments', 'residents', 'parking')
+
+def _round(values, decimals=0):
+    """``round(x, n)``; literals are numpy floats, numpy needs an int."""
+    return np.round(values, int(decimals))
+
+
+FUNCTIONS = {
+    'floor': np.floor,
+    'ceil': np.ceil,
+    'round': _round,
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'min': np.minimum,
+    'max': np.maximum,
+    'where': np.where,
+}
+
+# Helpers used by the compiled code; rule names may not start with '_'
+HELPERS = {
+    '_where': np.where,
+    '_and': np.logical_and,
+    '_or': np.logical_or,
+    '_not': np.logical_not,
+    '_number': np.float64,
+}
+
+# Fields written by the layer calculation (LayerProcessor.OUTPUT_FIELDS), not
+# available to rules; listed here so the rules can be compiled without QGIS
+RESERVED_FIELDS = ('bc_apts', 'bc_resid', 'bc_parking', 'bc_park_ar')
+
+ROUNDING = {
+    None: None,
+    'floor': np.floor,
+    'ceil': np.ceil,
+    'round': np.round,
+}
+
+ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+DEFAULT_RULES = {
+    "name": "Пример нормативов",
+    "rules": [
+        {"name": "parking", "title": "Парковочные места", "expr": "residents / 1000 * 350", "round": "floor",
+         "field": "bc_park_nr"},
+        {"name": "kinder", "title": "Места в детских садах", "expr": "residents / 1000 * 60", "round": "ceil"},
+        {"name": "school", "title": "Места в школах", "expr": "residents / 1000 * 120", "round": "ceil"},
+        {"name": "green", "title": "Озеленение, м²", "expr": "residents * 6"},
+    ]
+}
+
+
+def _call(name, args):
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+
+
+class _Vectorize(ast.NodeTransformer):
+    """Rewrite scalar control flow into numpy element-wise calls."""
+
+    def visit_Constant(self, node):
+        # numpy floats: 10 ** 10 ** 8 overflows to inf instead of building
+        # a huge Python integer
+        return _call('_number', [node])
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return _call('_where', [node.test, node.body, node.orelse])
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        function = '_and' if isinstance(node.op, ast.And) else '_or'
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = _call(function, [result, value])
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return _call('_not', [node.operand])
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        # a < b < c -> (a < b) & (b < c)
+        left = node.left
+        result = None
+        for op, right in zip(node.ops, node.comparators):
+            compare = ast.Compare(left=left, ops=[op], comparators=[right])
+            result = compare if result is None else _call('_and', [result, compare])
+            left = right
+        return result
+
+
+def compile_expression(text, names):
+    """Check an expression and compile it for array evaluation.
+
+    :param names: Variable names the expression may use.
+    :raises ValueError: If the expression is invalid or uses unknown names.
+    """
+    try:
+        tree = ast.parse(str(text), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f'Syntax error in "{text}": {e.msg}')
+
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f'Not allowed in "{text}": {type(node).__name__}')
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise ValueError(f'Unknown function in "{text}"')
+        elif isinstance(node, ast.Name) and id(node) not in called and node.id not in names:
+            if node.id in FUNCTIONS:
+                raise ValueError(f'Function "{node.id}" used without arguments in "{text}"')
+            raise ValueError(f'Unknown variable "{node.id}" in "{text}"')
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)):
+                raise ValueError(f'Only numbers are allowed in "{text}"')
+            try:
+                float(node.value)
+            except OverflowError:
+                raise ValueError(f'Number too large in "{text}"')
+
+    tree = ast.fix_missing_locations(_Vectorize().visit(tree))
+    return compile(tree, '<rule>', 'eval')
+
+
+class RuleSet:
+    """A compiled set of normative rules."""
+
+    def __init__(self, rules, name=''):
+        """Constructor.
+
+        :param rules: List of rule dicts with ``name``, ``expr`` and optional
+            ``title``, ``round`` and ``field``.
+        :raises ValueError: If a rule is invalid.
+        """
+        self.name = name
+        self.rules = []
+        names = set(VARIABLES)
+        rule_names = set()
+        fields = {}
+        for rule in rules:
+            if not isinstance(rule, dict):
+                raise ValueError('Every rule must be an object')
+            rule_name = rule.get('name', '')
+            if not isinstance(rule_name, str) or not rule_name.isidentifier() or \
+                    rule_name in FUNCTIONS or rule_name.startswith('_'):
+                raise ValueError(f'Invalid rule name: "{rule_name}"')
+            if rule_name in rule_names:
+                raise ValueError(f'Duplicate rule name: "{rule_name}"')
+            rule_names.add(rule_name)
+            rounding = rule.get('round')
+            if rounding not in ROUNDING:
+                raise ValueError(f'Invalid rounding "{rounding}" in rule "{rule_name}"')
+
+            # Shapefile field names are cut to 10 characters
+            field = rule.get('field', f'bc_{rule_name}'[:10])
+            if not isinstance(field, str) or not field:
+                raise ValueError(f'Invalid field name in rule "{rule_name}"')
+            if field in RESERVED_FIELDS:
+                raise ValueError(f'Field "{field}" of rule "{rule_name}" is used by the layer calculation')
+            if field in fields:
+                raise ValueError(
+                    f'Rules "{fields[field]}" and "{rule_name}" both write to field "{field}"; '
+                    f'set "field" for one of them'
+                )
+            fields[field] = rule_name
+
+            self.rules.append({
+                'name': rule_name,
+                'title': rule.get('title', rule_name),
+                'field': field,
+                'code': compile_expression(rule.get('expr', ''), names),
+                'round': ROUNDING[rounding],
+            })
+            names.add(rule_name)
+
+    @classmethod
+    def from_json(cls, text):
+        """Create a rule set from its JSON definition."""
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f'Invalid JSON: {e}')
+        if not isinstance(data, dict) or not isinstance(data.get('rules'), list):
+            raise ValueError('JSON must be an object with a "rules" list')
+        return cls(data['rules'], data.get('name', ''))
+
+    def evaluate(self, variables):
+        """Evaluate all rules for arrays of building variables.
+
+        :param variables: Dict of equally shaped arrays, see VARIABLES.
+        :returns: Dict of rule name to result array, in rule order.
+        :raises ValueError: If a rule cannot be evaluated, e.g. a function
+            called with the wrong number of arguments.
+        """
+        shape = np.shape(next(iter(variables.values())))
+        namespace = dict(FUNCTIONS)
+        namespace.update(HELPERS)
+        namespace.update(variables)
+
+        results = {}
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for rule in self.rules:
+                try:
+                    value = eval(rule['code'], {'__builtins__': {}}, namespace)
+                    value = np.broadcast_to(np.asarray(value, dtype=np.float64), shape)
+                except (ArithmeticError, TypeError, ValueError) as e:
+                    raise ValueError(f'Error in rule "{rule["name"]}": {e}')
+                if rule['round'] is not None:
+                    value = rule['round'](value)
+                namespace[rule['name']] = value
+                results[rule['name']] = value
+        return results
+
+
+def building_variables(areas, floors, params):
+    """Base rule variables for arrays of footprint areas and floors."""
+    areas = np.asarray(areas, dtype=np.float64)
+    floors = np.asarray(floors, dtype=np.float64)
+    total_area = areas * floors
+    apartments, residents, parking = calculate_arrays(total_area, params)
+    return {
+        'footprint': areas,
+        'floors': floors,
+        'total_area': total_area,
+        'apartments': apartments,
+        'residents': residents,
+        'parking': parking,
+    }
+
+
+def evaluate_layer(layer, ruleset, params, floors_field=None, default_floors=5):
+    """Evaluate a rule set for all buildings of a layer and write the results.
+
+    Every rule is written to its own field.
+
+    :returns: Dict of rule name to total over the layer.
+    """
+    from .layer_processor import read_layer, write_layer_fields
+    fids, areas, floors, _ = read_layer(layer, floors_field, default_floors)
+    results = ruleset.evaluate(building_variables(areas, floors, params))
+    write_layer_fields(layer, fids, {
+        rule['field']: results[rule['name']] for rule in ruleset.rules
+    })
+    return {name: float(np.nansum(values)) for name, values in results.items()}
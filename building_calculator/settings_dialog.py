@@ -22,6 +22,8 @@ class SettingsDialog(QDialog):
     KEY_USE_APT_TYPES = 'BuildingCalculator/useApartmentTypes'
     KEY_AVG_APT_SIZE = 'BuildingCalculator/avgApartmentSize'
     KEY_PARKING_PER_APT = 'BuildingCalculator/parkingPerApartment'
+    KEY_NORM_RULES = 'BuildingCalculator/normRules'
+    KEY_API_PORT = 'BuildingCalculator/apiPort'
     
     # Default values
     DEFAULT_RESIDENTS_PER_APT = 2.5
@@ -29,6 +31,13 @@ class SettingsDialog(QDialog):
     DEFAULT_USE_APT_TYPES = True
     DEFAULT_AVG_APT_SIZE = 50.0
     DEFAULT_PARKING_PER_APT = 1.0
+    DEFAULT_RESIDENTS_MODE = 'per_apt'
+    DEFAULT_SQM_PER_RESIDENT = 20.0
+    DEFAULT_PARKING_MODE = 'per_residents'
+    DEFAULT_PARKINGS_FOR_RESIDENTS = 350.0  # 350 parkings per 1000 residents
+    DEFAULT_PER_RESIDENTS = 1000.0
+    DEFAULT_PARKINGS_FOR_SQM = 1.0  # 1 parking per 50 sqm
+    DEFAULT_PER_SQM = 50.0
     DEFAULT_APARTMENT_TYPES = [
         {"name": "Студия", "size": 25, "parking": 0.5, "residents": 1.0},
         {"name": "1-комн", "size": 40, "parking": 1.0, "residents": 1.5},
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the local HTTP API, against a server on localhost (no QGIS needed)
+"""
+
+import http.client
+import json
+import socket
+import unittest
+
+from building_calculator import calculator
+from building_calculator.api_server import CalculatorServer, MAX_FLOORS
+
+
+# Default plugin settings, as returned by calculator.params_from_settings
+PARAMS = {
+    'use_types': True,
+    'apt_types': [
+        {'name': 'Студия', 'size': 25, 'parking': 0.5, 'residents': 1.0},
+        {'name': '1-комн', 'size': 40, 'parking': 1.0, 'residents': 1.5},
+        {'name': '2-комн', 'size': 60, 'parking': 1.0, 'residents': 2.5},
+        {'name': '3-комн', 'size': 90, 'parking': 1.5, 'residents': 3.5},
+        {'name': '4-комн', 'size': 130, 'parking': 2.0, 'residents': 4.5},
+    ],
+    'avg_apt_size': 50.0,
+    'residents_mode': 'per_apt',
+    'residents_per_apt': 2.5,
+    'sqm_per_resident': 20.0,
+    'parking_spot_size': 25.0,
+    'parking_mode': 'per_residents',
+    'parking_per_apt': 1.0,
+    'parkings_for_residents': 350.0,
+    'per_residents': 1000.0,
+    'parkings_for_sqm': 1.0,
+    'per_sqm': 50.0,
+}
+
+
+class ApiServerTest(unittest.TestCase):
+    """Requests against a server started on a free port."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = CalculatorServer(PARAMS, port=0)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.connection = http.client.HTTPConnection(self.server.host, self.server.port, timeout=5)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload)
+        self.connection.request(method, path, body)
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def raw_request(self, data):
+        """Send raw bytes on a new connection; returns the status code."""
+        with socket.create_connection((self.server.host, self.server.port), timeout=5) as sock:
+            sock.sendall(data)
+            response = b''
+            while b'\r\n' not in response:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                response += chunk
+        return int(response.split(b' ', 2)[1]) if response else None
+
+    def test_health(self):
+        self.assertEqual(self.request('GET', '/health'), (200, {'status': 'ok'}))
+
+    def test_params(self):
+        self.assertEqual(self.request('GET', '/params'), (200, PARAMS))
+
+    def test_calculate_matches_calculator(self):
+        status, result = self.request('POST', '/calculate', {'area': 500, 'floors': 9})
+        self.assertEqual(status, 200)
+        self.assertEqual(result, calculator.calculate(500.0, 9, PARAMS))
+
+    def test_batch_and_params(self):
+        buildings = [{'area': 500, 'floors': 9}, {'area': 120.5, 'floors': 3}]
+        status, result = self.request('POST', '/calculate', {
+            'buildings': buildings, 'params': {'use_types': False, 'parking_per_apt': 0},
+        })
+        self.assertEqual(status, 200)
+        params = dict(PARAMS, use_types=False, parking_per_apt=0)
+        self.assertEqual(result['results'], [
+            calculator.calculate(float(b['area']), b['floors'], params) for b in buildings
+        ])
+
+    def test_keep_alive(self):
+        for _ in range(3):
+            self.assertEqual(self.request('GET', '/health')[0], 200)
+
+    def test_invalid_buildings(self):
+        for building in (
+            {'area': 500},
+            {'area': -1, 'floors': 5},
+            {'area': 'big', 'floors': 5},
+            {'area': 500, 'floors': 0},
+            {'area': 500, 'floors': MAX_FLOORS + 1},
+            {'area': 500, 'floors': 2.5},
+            {'area': 500, 'floors': True},
+            [500, 5],
+        ):
+            with self.subTest(building=building):
+                self.assertEqual(self.request('POST', '/calculate', building)[0], 400)
+
+    def test_invalid_params(self):
+        for params in (
+            {'unknown': 1},
+            {'avg_apt_size': 0},
+            {'sqm_per_resident': 0},
+            {'parking_mode': 'per_floor'},
+            {'use_types': 'yes'},
+            {'apt_types': [{'size': 'large'}]},
+            {'apt_types': {}},
+        ):
+            with self.subTest(params=params):
+                status, _ = self.request('POST', '/calculate', {'area': 500, 'floors': 5, 'params': params})
+                self.assertEqual(status, 400)
+
+    def test_non_finite_numbers(self):
+        for body in (b'{"area": 1e309, "floors": 5}', b'{"area": NaN, "floors": 5}'):
+            with self.subTest(body=body):
+                self.connection.request('POST', '/calculate', body)
+                response = self.connection.getresponse()
+                response.read()
+                self.assertEqual(response.status, 400)
+
+    def test_overflowing_result(self):
+        apt_types = [{'name': 'x', 'size': 1, 'count': 1e308, 'residents': 1e308}] * 2
+        status, result = self.request('POST', '/calculate', {
+            'area': 1e300, 'floors': 1, 'params': {'apt_types': apt_types},
+        })
+        self.assertEqual(status, 400)
+        self.assertIn('finite', result['error'])
+
+    def test_invalid_json(self):
+        self.connection.request('POST', '/calculate', b'{')
+        response = self.connection.getresponse()
+        response.read()
+        self.assertEqual(response.status, 400)
+
+    def test_unknown_path_and_method(self):
+        self.assertEqual(self.request('GET', '/unknown')[0], 404)
+        self.assertEqual(self.request('GET', '/calculate')[0], 405)
+
+    def test_negative_content_length(self):
+        status = self.raw_request(b'POST /calculate HTTP/1.1\r\nContent-Length: -1\r\n\r\n')
+        self.assertEqual(status, 400)
+
+    def test_long_header_line(self):
+        status = self.raw_request(b'GET /health HTTP/1.1\r\nX-Long: ' + b'a' * 100000 + b'\r\n\r\n')
+        self.assertEqual(status, 431)
+
+    def test_long_request_line(self):
+        status = self.raw_request(b'GET /' + b'a' * 100000 + b' HTTP/1.1\r\n\r\n')
+        self.assertEqual(status, 400)
+
+    def test_server_survives_errors(self):
+        self.raw_request(b'GARBAGE\r\n\r\n')
+        self.assertEqual(self.request('GET', '/health')[0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
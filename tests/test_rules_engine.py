@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the normative rules engine (no QGIS needed)
+"""
+
+import unittest
+import numpy as np
+
+from building_calculator.rules_engine import DEFAULT_RULES, RuleSet, compile_expression, VARIABLES
+
+
+def evaluate(expr, **variables):
+    """Evaluate a single rule over arrays of variables."""
+    variables = {name: np.asarray(value, dtype=np.float64) for name, value in variables.items()}
+    return RuleSet([{'name': 'x', 'expr': expr}]).evaluate(variables)['x']
+
+
+class CompileExpressionTest(unittest.TestCase):
+    """Expressions that must be rejected before evaluation."""
+
+    def assert_rejected(self, expr, message=''):
+        with self.assertRaises(ValueError) as context:
+            compile_expression(expr, set(VARIABLES))
+        self.assertIn(message, str(context.exception))
+
+    def test_syntax_error(self):
+        self.assert_rejected('residents *', 'Syntax error')
+
+    def test_unknown_variable(self):
+        self.assert_rejected('people * 2', 'Unknown variable "people"')
+
+    def test_unknown_function(self):
+        self.assert_rejected('exp(residents)', 'Unknown function')
+
+    def test_function_without_arguments(self):
+        self.assert_rejected('floor + 1', 'used without arguments')
+
+    def test_keyword_arguments(self):
+        self.assert_rejected('round(residents, decimals=1)', 'Unknown function')
+
+    def test_strings(self):
+        self.assert_rejected('"residents"', 'Only numbers')
+
+    def test_number_too_large(self):
+        self.assert_rejected('1' + '0' * 400, 'Number too large')
+
+    def test_sandbox(self):
+        for expr in (
+            '__import__("os")',
+            'residents.__class__',
+            '(lambda: 1)()',
+            '[residents]',
+            'residents[0]',
+            'open("x")',
+            'x := 1',
+        ):
+            with self.subTest(expr=expr):
+                self.assert_rejected(expr)
+
+
+class EvaluateTest(unittest.TestCase):
+    """Results of valid expressions."""
+
+    def test_arithmetic(self):
+        np.testing.assert_allclose(evaluate('residents / 1000 * 350', residents=[1000, 2000]), [350, 700])
+
+    def test_round_with_digits(self):
+        np.testing.assert_allclose(evaluate('round(residents / 7, 1)', residents=[10, 100]), [1.4, 14.3])
+
+    def test_round_without_digits(self):
+        np.testing.assert_allclose(evaluate('round(residents / 4)', residents=[10, 14]), [2, 4])
+
+    def test_conditional(self):
+        result = evaluate('residents * 2 if floors > 9 else residents', residents=[10, 10], floors=[5, 12])
+        np.testing.assert_allclose(result, [10, 20])
+
+    def test_chained_comparison_and_bool_ops(self):
+        result = evaluate('1 if 5 < floors <= 9 and not residents > 100 else 0',
+                          floors=[5, 6, 9, 10, 7], residents=[0, 0, 0, 0, 200])
+        np.testing.assert_allclose(result, [0, 1, 1, 0, 0])
+
+    def test_scalar_result_is_broadcast(self):
+        np.testing.assert_allclose(evaluate('6', residents=[1, 2, 3]), [6, 6, 6])
+
+    def test_overflow_is_inf(self):
+        self.assertTrue(np.isinf(evaluate('10 ** 10 ** 8', residents=[1])).all())
+
+    def test_division_by_zero(self):
+        result = evaluate('residents / floors', residents=[1, 0], floors=[0, 0])
+        self.assertTrue(np.isinf(result[0]))
+        self.assertTrue(np.isnan(result[1]))
+
+    def test_wrong_number_of_arguments(self):
+        with self.assertRaises(ValueError) as context:
+            evaluate('min(residents)', residents=[1])
+        self.assertIn('Error in rule "x"', str(context.exception))
+
+    def test_rounding_and_earlier_rules(self):
+        ruleset = RuleSet([
+            {'name': 'a', 'expr': 'residents / 3', 'round': 'ceil'},
+            {'name': 'b', 'expr': 'a * 2'},
+            {'name': 'residents', 'expr': 'residents + 1'},
+            {'name': 'c', 'expr': 'residents'},
+        ])
+        results = ruleset.evaluate({'residents': np.array([10.0])})
+        self.assertEqual(list(results), ['a', 'b', 'residents', 'c'])
+        np.testing.assert_allclose(results['a'], [4])
+        np.testing.assert_allclose(results['b'], [8])
+        np.testing.assert_allclose(results['c'], [11])
+
+
+class RuleSetTest(unittest.TestCase):
+    """Validation of rule definitions."""
+
+    def assert_rejected(self, rules, message):
+        with self.assertRaises(ValueError) as context:
+            RuleSet(rules)
+        self.assertIn(message, str(context.exception))
+
+    def test_default_rules(self):
+        ruleset = RuleSet(DEFAULT_RULES['rules'])
+        self.assertEqual(ruleset.rules[0]['field'], 'bc_park_nr')
+
+    def test_duplicate_names(self):
+        self.assert_rejected([
+            {'name': 'a', 'expr': '1', 'field': 'f1'},
+            {'name': 'a', 'expr': '2', 'field': 'f2'},
+        ], 'Duplicate rule name: "a"')
+
+    def test_duplicate_fields(self):
+        # Both default to the first 10 characters: bc_kinderg
+        self.assert_rejected([
+            {'name': 'kindergarten', 'expr': '1'},
+            {'name': 'kindergarten2', 'expr': '2'},
+        ], 'both write to field "bc_kinderg"')
+
+    def test_reserved_field(self):
+        self.assert_rejected([{'name': 'parking', 'expr': '1'}], 'used by the layer calculation')
+
+    def test_invalid_names(self):
+        for name in ('', '1a', 'a b', '_where', 'floor', 5):
+            with self.subTest(name=name):
+                self.assert_rejected([{'name': name, 'expr': '1'}], 'Invalid rule name')
+
+    def test_invalid_rounding(self):
+        self.assert_rejected([{'name': 'a', 'expr': '1', 'round': 'up'}], 'Invalid rounding')
+
+    def test_rule_not_an_object(self):
+        self.assert_rejected(['a'], 'must be an object')
+
+    def test_from_json(self):
+        with self.assertRaises(ValueError):
+            RuleSet.from_json('{')
+        with self.assertRaises(ValueError):
+            RuleSet.from_json('[]')
+        ruleset = RuleSet.from_json('{"name": "n", "rules": [{"name": "a", "expr": "residents"}]}')
+        self.assertEqual(ruleset.name, 'n')
+
+
+if __name__ == '__main__':
+    unittest.main()